@@ -1,6 +1,6 @@
 from pydantic_settings import BaseSettings
 from pydantic import SecretStr, Field
-from typing import Optional, Any
+from typing import Optional, Any, List, Dict
 import logging
 from dotenv import load_dotenv
 from openai import AsyncOpenAI
@@ -16,10 +16,108 @@ class Settings(BaseSettings):
     tokko_api_key: SecretStr = os.getenv("TOKKO_API_KEY")
     tokko_base_url: str = os.getenv("TOKKO_BASE_URL", "https://www.tokkobroker.com/api/v1")
     debug: bool = False
+
+    # Tokko inventory sync
+    tokko_page_size: int = 50
+    tokko_sync_concurrency: int = 4
+    tokko_delta_order_by: str = "-deleted_at"
+    tokko_active_statuses: List[int] = [2]
+    inventory_delta_sync_seconds: int = 60
+    inventory_full_sync_minutes: int = 60
+    inventory_refresh_jitter: float = 0.2
+    inventory_stale_warning_seconds: int = 600
+    # Persisted state defaults to /tmp for local runs; on Cloud Run /tmp does not outlive
+    # the instance, so the deploy points these at a Cloud Storage mount (see README)
+    inventory_snapshot_path: str = "/tmp/altamirano_inventory.snap"
+    tokko_metadata_path: str = "/tmp/altamirano_metadata.json"
+    tokko_metadata_ttl_hours: int = 24
+
+    # Location resolution
+    location_aliases: Dict[str, Any] = {}
+    location_fuzzy_threshold: float = 0.45
+
+    # Keyword search: share of query terms a listing must contain, and results kept
+    text_min_should_match: float = 1.0
+    text_search_top_k: int = 20
+
+    # Geo search ("near" queries); landmarks map a name to [lat, long]
+    geo_cell_km: float = 0.5
+    geo_default_radius_km: float = 1.5
+    geo_max_radius_km: float = 50.0
+    geo_landmarks: Dict[str, List[float]] = {}
+
+    # Price normalization: rates are units of each currency per 1 base currency unit
+    price_base_currency: str = "USD"
+    price_default_currency: str = "USD"
+    exchange_rates: Dict[str, float] = {"USD": 1.0, "ARS": 1000.0}
+    exchange_rates_url: Optional[str] = None
+    exchange_rates_refresh_minutes: int = 60
+
+    # In-memory result cache (search results per snapshot, property details)
+    result_cache_ttl_seconds: int = 300
+    result_cache_max_entries: int = 2048
+    result_cache_max_bytes: int = 64 * 1024 * 1024
+    result_cache_sweep_seconds: int = 60
+    property_detail_ttl_seconds: int = 900
+
+    # HTTP caching (Cache-Control max-age) for inventory responses and static assets
+    api_cache_seconds: int = 30
+    static_cache_seconds: int = 3600
+    static_cache_max_file_bytes: int = 2 * 1024 * 1024
+
+    # Optional /img/{property_id}/{n} photo proxy with an on-disk LRU cache
+    image_proxy_enabled: bool = False
+    image_cache_dir: str = "/tmp/altamirano_images"
+    image_cache_max_bytes: int = 256 * 1024 * 1024
+    image_widths: List[int] = [160, 320, 480, 800]
+    image_thumb_width: int = 200
+    image_card_width: int = 480
+    image_cache_seconds: int = 86400
+
+    # Tokko call resilience: per-call deadline, jittered retries within a budget,
+    # hedging past the observed p95 and a circuit breaker
+    tokko_deadline_seconds: float = 15.0
+    tokko_max_attempts: int = 3
+    tokko_retry_base_delay: float = 0.2
+    tokko_retry_budget_ratio: float = 0.2
+    tokko_retry_budget_capacity: float = 10.0
+    tokko_hedge_enabled: bool = True
+    tokko_hedge_min_samples: int = 20
+    tokko_breaker_failures: int = 5
+    tokko_breaker_reset_seconds: float = 30.0
+
+    # Tokko HTTP connection pool
+    tokko_pool_limit: int = 20
+    tokko_pool_limit_per_host: int = 10
+    tokko_keepalive_seconds: float = 30.0
+    tokko_dns_cache_seconds: int = 300
+    tokko_connect_timeout: float = 5.0
+    tokko_read_timeout: float = 20.0
+    tokko_total_timeout: float = 30.0
+
+    # Assistant reuse: a configured id, else the id recorded for the definition hash
+    openai_assistant_id: Optional[str] = None
+    assistant_registry_path: str = "/tmp/altamirano_assistant.json"
+
+    # Fully specified searches are answered from the local index without a run
+    slot_fast_path_enabled: bool = True
+    slot_fast_path_min_confidence: float = 0.9
+
+    # Replies to first turns (no thread yet), keyed by the canonical message and snapshot version
+    chat_cache_enabled: bool = True
+    chat_cache_ttl_seconds: int = 600
+
+    # Assistants runs are consumed as event streams; polling is the fallback
+    openai_streaming_enabled: bool = True
+    # Polling fallback: first interval doubles up to the cap (jittered) until the run timeout
+    openai_poll_initial_seconds: float = 0.1
+    openai_poll_max_seconds: float = 2.0
+    openai_run_timeout_seconds: float = 240.0
     
     # Add fields for clients
     openai_client: Optional[Any] = None
     tokko_client: Optional[Any] = None
+    inventory_refresher: Optional[Any] = None
 
     class Config:
         arbitrary_types_allowed = True
@@ -48,6 +146,28 @@ class Settings(BaseSettings):
             logger.error(f"Failed to initialize Tokko client: {e}")
             raise
 
+    async def initialize_assistant(self):
+        """Resolve the OpenAI assistant before the first chat request"""
+        try:
+            from app.services.aiAssistant import SimpleAssistant
+            await SimpleAssistant.get_instance()
+            logger.info("Assistant initialized successfully")
+        except Exception as e:
+            # Not fatal: the first chat request retries the lookup
+            logger.error(f"Failed to initialize assistant: {e}")
+
+    async def initialize_inventory(self):
+        """Start the background inventory refresher"""
+        try:
+            from app.services.aiAssistant import TokkoClient
+            from app.services.inventoryRefresher import InventoryRefresher
+            self.inventory_refresher = InventoryRefresher(TokkoClient())
+            await self.inventory_refresher.start()
+            logger.info("Inventory refresher initialized successfully")
+        except Exception as e:
+            logger.error(f"Failed to initialize inventory refresher: {e}")
+            raise
+
 @lru_cache()
 def get_settings() -> Settings:
     try:
@@ -1,9 +1,10 @@
 from fastapi import FastAPI, Request, HTTPException, status
 from fastapi.responses import JSONResponse, HTMLResponse, Response, FileResponse
 from fastapi.templating import Jinja2Templates
-from fastapi.staticfiles import StaticFiles
 from app.config.settings import settings  # Updated import
 from app.services.aiAssistant import SimpleAssistant  # Updated import
+from app.services.cache import result_cache
+from app.services.httpCache import CachedStaticFiles
 from starlette.middleware.errors import ServerErrorMiddleware
 from starlette.middleware.base import BaseHTTPMiddleware
 from fastapi.middleware.cors import CORSMiddleware
@@ -28,6 +29,10 @@ async def lifespan(app: FastAPI):
         logger.info("Starting application initialization...")
         await settings.initialize_openai()
         await settings.initialize_tokko()
+        await settings.tokko_client.start()
+        # After Tokko, so the assistant's search client shares the started transport
+        await settings.initialize_assistant()
+        await settings.initialize_inventory()
         logger.info("Application initialization complete")
         yield
     except Exception as e:
@@ -35,6 +40,10 @@ async def lifespan(app: FastAPI):
         raise
     finally:
         logger.info("Application shutdown initiated")
+        if settings.inventory_refresher:
+            await settings.inventory_refresher.stop()
+        if settings.tokko_client:
+            await settings.tokko_client.close()
 
 # Initialize FastAPI with explicit configuration
 app = FastAPI(
@@ -49,12 +58,14 @@ app = FastAPI(
 )
 
 # Import routes after app initialization to avoid circular imports
-from app.routes import chat_router, properties_router, chat
+from app.routes import chat_router, properties_router, images_router, chat
 
 # Include routers
 app.include_router(chat_router)
 app.include_router(properties_router)
 app.include_router(chat.router)
+if settings.image_proxy_enabled:
+    app.include_router(images_router)
 
 # Middleware configuration
 app.add_middleware(ServerErrorMiddleware)
@@ -103,8 +114,8 @@ templates_dir = os.path.join(BASE_DIR, "templates")
 os.makedirs(static_dir, exist_ok=True)
 os.makedirs(templates_dir, exist_ok=True)
 
-# Mount static files with custom configuration
-app.mount("/static", StaticFiles(
+# Mount static files with content-hash ETags and precompressed bodies
+app.mount("/static", CachedStaticFiles(
     directory=static_dir,
     check_dir=True,
     html=True
@@ -162,6 +173,11 @@ async def health_check():
                 "openai": "initialized" if hasattr(settings, 'openai_client') else "not initialized",
                 "tokko": "initialized" if hasattr(settings, 'tokko_client') else "not initialized"
             },
+            "inventory": settings.inventory_refresher.status() if settings.inventory_refresher else None,
+            "tokko_flights": settings.tokko_client.flights.stats() if settings.tokko_client else None,
+            "tokko_resilience": settings.tokko_client.resilience.status() if settings.tokko_client else None,
+            "result_cache": result_cache.stats(),
+            "assistant_runs": SimpleAssistant._instance.runs.stats() if SimpleAssistant._instance else None,
             "system": {
                 "python_version": sys.version,
                 "templates_dir": os.path.exists(templates_dir),
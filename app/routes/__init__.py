@@ -1,4 +1,5 @@
 """Routes package."""
 
 from .chat import router as chat_router
-from .properties import router as properties_router
\ No newline at end of file
+from .properties import router as properties_router
+from .images import router as images_router
@@ -1,6 +1,6 @@
 from fastapi import APIRouter, Request, HTTPException, status
 from fastapi.responses import JSONResponse
-from app.services.aiAssistant import SimpleAssistant, OpenAIError
+from app.services.aiAssistant import SimpleAssistant, OpenAIError, inventory_cache
 from pydantic import BaseModel
 import logging
 import json
@@ -66,32 +66,8 @@ async def chat(message: ChatMessage):
                     logger.info("="*50)
                     logger.info("GENERATING PROPERTY CARDS HTML")
                     
-                    html = '<div class="properties-grid">'
-                    for prop in properties_data["data"]:
-                        html += f'''
-                            <div class="property-card">
-                                <div class="property-image">
-                                    <img src="{prop['image_url']}" alt="{prop['title']}">
-                                    <div class="property-tags">
-                                        <span class="tag operation-tag">{prop['operation_type']}</span>
-                                        <span class="tag price-tag">{prop['price']}</span>
-                                    </div>
-                                </div>
-                                <div class="property-content">
-                                    <h3 class="property-title">{prop['title']}</h3>
-                                    <p class="property-location"><i class="fas fa-map-marker-alt"></i> {prop['address']}</p>
-                                    <div class="property-details">
-                                        <span class="detail-item"><i class="fas fa-ruler-combined"></i> {prop.get('surface', 'N/A')}</span>
-                                        <span class="detail-item"><i class="fas fa-money-bill-wave"></i> Exp: {prop.get('expenses', 'N/A')}</span>
-                                    </div>
-                                    <p class="property-description">{prop['description'][:150]}...</p>
-                                    <a href="{prop['url']}" class="property-button" target="_blank">
-                                        Ver más detalles <i class="fas fa-external-link-alt"></i>
-                                    </a>
-                                </div>
-                            </div>
-                        '''
-                    html += '</div>'
+                    # Join the cards rendered at sync time instead of rebuilding them
+                    html = inventory_cache.snapshot.cards.grid(prop.get('id') for prop in properties_data["data"])
                     
                     logger.info("="*50)
                     logger.info("SENDING HTML RESPONSE")
@@ -216,78 +192,8 @@ def parse_properties(content):
     return properties
 
 def render_properties_grid(properties):
-    """Generate HTML grid for properties"""
-    html = '<div class="properties-grid">'
-    
-    for prop in properties:
-        # Get property details from Tokko data
-        operation = next((op for op in prop.get('operations', []) if op.get('prices')), {})
-        price_data = next(iter(operation.get('prices', [])), {})
-        
-        # Get the first image if available
-        image_url = next((
-            p['image'].get('url', '') if isinstance(p.get('image'), dict) else p.get('image', '')
-            for p in prop.get('photos', []) if p.get('image')
-        ), '')
-        
-        # Format price with thousands separator
-        try:
-            price = int(price_data.get('price', 0))
-            price_formatted = f"ARS {price:,}"
-        except:
-            price_formatted = "Consultar"
-            
-        # Format expenses
-        try:
-            expenses = int(prop.get('expenses', 0))
-            expenses_formatted = f"ARS {expenses:,}"
-        except:
-            expenses_formatted = "Consultar"
-
-        html += f'''
-            <div class="property-card">
-                <div class="property-image">
-                    <img src="{image_url}" alt="{prop.get('publication_title', 'Propiedad')}" loading="lazy">
-                    <div class="property-tags">
-                        <span class="tag operation-tag">{operation.get('operation_type', 'Alquiler')}</span>
-                        <span class="tag price-tag">{price_formatted}</span>
-                    </div>
-                </div>
-                <div class="property-content">
-                    <h3 class="property-title">{prop.get('publication_title', '')}</h3>
-                    <p class="property-location">
-                        <i class="fas fa-map-marker-alt"></i> 
-                        {prop.get('location', {}).get('address', 'Consultar ubicación')}
-                    </p>
-                    <div class="property-details">
-                        <div class="detail-row">
-                            <span class="detail-item">
-                                <i class="fas fa-ruler-combined"></i> {prop.get('total_surface', 'N/A')} m²
-                            </span>
-                            <span class="detail-item">
-                                <i class="fas fa-money-bill-wave"></i> Exp: {expenses_formatted}
-                            </span>
-                        </div>
-                        <div class="detail-row">
-                            <span class="detail-item">
-                                <i class="fas fa-door-open"></i> {prop.get('room_amount', 'N/A')} Amb.
-                            </span>
-                            <span class="detail-item">
-                                <i class="fas fa-bath"></i> {prop.get('bathroom_amount', 'N/A')} Baños
-                            </span>
-                        </div>
-                    </div>
-                    <p class="property-description">{prop.get('description', '')[:200]}...</p>
-                    <a href="{prop.get('public_url', '#')}" class="property-button" target="_blank">
-                        <span>Ver más detalles en Tokko</span>
-                        <i class="fas fa-external-link-alt"></i>
-                    </a>
-                </div>
-            </div>
-        '''
-    
-    html += '</div>'
-    return html
+    """Generate HTML grid for properties (PropertyRecords of the current snapshot)"""
+    return inventory_cache.snapshot.cards.grid(prop.id for prop in properties)
 
 def generate_property_card(prop):
     """Generate HTML for a single property card"""
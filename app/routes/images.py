@@ -0,0 +1,38 @@
+from fastapi import APIRouter, Depends, HTTPException, Request, status
+from typing import Optional
+from app.config.settings import settings
+from app.services.aiAssistant import inventory_cache
+from app.services.httpCache import CachedBody, cached_response
+from app.services.imageProxy import DiskLRUCache, ImageNotFound, ImageProxy, http_origin_fetcher
+from app.services.tokkoClient import TokkoClient as AsyncTokkoClient
+import logging
+
+logger = logging.getLogger(__name__)
+router = APIRouter()
+
+_image_proxy: Optional[ImageProxy] = None
+
+def get_image_proxy() -> ImageProxy:
+    """Shared proxy; override this dependency to plug in another origin fetcher"""
+    global _image_proxy
+    if _image_proxy is None:
+        transport = settings.tokko_client or AsyncTokkoClient()
+        _image_proxy = ImageProxy(
+            lookup=inventory_cache.get,
+            fetcher=http_origin_fetcher(transport.get_session),
+            cache=DiskLRUCache(settings.image_cache_dir, settings.image_cache_max_bytes)
+        )
+    return _image_proxy
+
+@router.get("/img/{property_id}/{n}")
+async def get_image(request: Request, property_id: int, n: int, w: Optional[int] = None,
+                    proxy: ImageProxy = Depends(get_image_proxy)):
+    try:
+        body, content_type = await proxy.get(property_id, n, w)
+    except ImageNotFound as e:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=str(e))
+    except Exception as e:
+        logger.error(f"Image proxy error for {property_id}/{n}: {str(e)}")
+        raise HTTPException(status_code=status.HTTP_502_BAD_GATEWAY, detail="Image origin unavailable")
+    return cached_response(request.headers, CachedBody(body, content_type),
+                           f"public, max-age={settings.image_cache_seconds}")
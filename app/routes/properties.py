@@ -1,36 +1,160 @@
-from fastapi import APIRouter, HTTPException, status
+from fastapi import APIRouter, HTTPException, Query, Request, status
 from fastapi.responses import JSONResponse
-from typing import Optional
-from app.services.aiAssistant import SimpleAssistant
+from typing import Dict, List, Optional, Tuple
+from app.config.settings import settings
+from app.services.aiAssistant import SimpleAssistant, inventory_cache
+from app.services.cache import result_cache
+from app.services.exchangeRates import exchange_rates
+from app.services.httpCache import CachedBody, api_cache_control, cached_response
+from app.services.propertyColumns import SORT_FIELDS
+from app.services.propertyIndex import normalize_search_params
+from app.services.propertyRecord import PropertyRecord
+import base64
+import hashlib
+import json
 import logging
 
 logger = logging.getLogger(__name__)
 router = APIRouter()
 
+# Projection used when the client does not ask for specific fields
+DEFAULT_FIELDS = (
+    'id', 'title', 'type_name', 'location_name', 'address', 'operations', 'rooms',
+    'bathrooms', 'total_surface', 'expenses', 'image_url', 'thumb_url', 'public_url'
+)
+MAX_LIMIT = 100
+
+def _query_digest(search_params: Dict) -> str:
+    return hashlib.sha1(repr(normalize_search_params(search_params)).encode()).hexdigest()[:12]
+
+def _encode_cursor(offset: int, last_id, digest: str) -> str:
+    raw = json.dumps({"o": offset, "id": last_id, "q": digest}, separators=(',', ':'))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+def _decode_cursor(cursor: str, digest: str) -> Tuple[int, Optional[int]]:
+    try:
+        data = json.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)))
+        offset, last_id, query = int(data["o"]), data.get("id"), data["q"]
+    except (ValueError, KeyError, TypeError):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid cursor")
+    if query != digest:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Cursor belongs to a different query")
+    return offset, last_id
+
+def _page_start(properties: List[PropertyRecord], offset: int, last_id) -> int:
+    """Resume right after the last listing served; fall back to the offset if it left the results"""
+    if 0 < offset <= len(properties) and properties[offset - 1].id == last_id:
+        return offset
+    for position, prop in enumerate(properties):
+        if prop.id == last_id:
+            return position + 1
+    return min(offset, len(properties))
+
+def _projection(fields: Optional[str]) -> Tuple[str, ...]:
+    if not fields:
+        return DEFAULT_FIELDS
+    requested = tuple(field.strip() for field in fields.split(',') if field.strip())
+    unknown = [field for field in requested if field not in PropertyRecord.__slots__]
+    if unknown:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST,
+                            detail=f"Unknown fields: {', '.join(unknown)}")
+    return requested
+
+async def _page(assistant, search_params: Dict, digest: str, limit: int, cursor: Optional[str],
+                offset: int, last_id, projection: Tuple[str, ...]) -> Dict:
+    # The full ordered result is cached per query, so every page is a slice
+    properties = await assistant.tokko_client.search_properties(search_params)
+    if "error" in properties:
+        raise RuntimeError(properties["error"])
+    matches = properties["properties"]
+    start = _page_start(matches, offset, last_id) if cursor else 0
+    page = matches[start:start + limit]
+    end = start + len(page)
+    return {
+        "status": "success",
+        "data": {
+            "count": len(page),
+            "total": len(matches),
+            "properties": [prop.to_dict(projection) for prop in page],
+            "next_cursor": _encode_cursor(end, page[-1].id, digest) if page and end < len(matches) else None
+        }
+    }
+
 @router.get("/api/properties")
 async def get_properties(
+    request: Request,
     operation_type: Optional[str] = None,
     property_type: Optional[str] = None,
-    location: Optional[str] = None
+    location: Optional[str] = None,
+    near: Optional[str] = None,
+    radius_km: Optional[float] = Query(None, gt=0, le=settings.geo_max_radius_km),
+    min_price: Optional[float] = None,
+    max_price: Optional[float] = None,
+    currency: Optional[str] = None,
+    sort: Optional[str] = None,
+    limit: int = Query(20, ge=1, le=MAX_LIMIT),
+    cursor: Optional[str] = None,
+    fields: Optional[str] = None
 ):
+    if sort and sort.lstrip('+-') not in SORT_FIELDS:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST,
+                            detail=f"sort must be one of {', '.join(SORT_FIELDS)} (prefix '-' for descending)")
+    projection = _projection(fields)
+
     try:
         assistant = SimpleAssistant()
         search_params = {k: v for k, v in {
             "operation_type": operation_type,
             "property_type": property_type,
-            "location": location
+            "location": location,
+            "near": near,
+            "radius_km": radius_km,
+            "min_price": min_price,
+            "max_price": max_price,
+            "currency": currency,
+            "sort": sort
         }.items() if v is not None}
-        
-        properties = await assistant.tokko_client.search_properties(search_params)
-        return JSONResponse(
-            content={
-                "status": "success",
-                "data": properties
-            }
-        )
+        digest = _query_digest(search_params)
+        offset, last_id = _decode_cursor(cursor, digest) if cursor else (0, None)
+
+        # A page only changes when the snapshot (or the exchange rates) do, so the
+        # serialized and compressed body is cached per version and revalidated by ETag
+        await assistant.tokko_client.ensure_inventory()
+        key = (inventory_cache.version, exchange_rates.version, digest, limit, cursor, projection)
+        cached = result_cache.get(key, "http")
+        if cached is None:
+            content = await _page(assistant, search_params, digest, limit, cursor, offset, last_id, projection)
+            cached = CachedBody(json.dumps(content, ensure_ascii=False).encode('utf-8'), "application/json")
+            result_cache.set(key, cached, "http", size=2 * len(cached.body))
+        return cached_response(request.headers, cached, api_cache_control())
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Properties error: {str(e)}")
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=str(e)
-        )
\ No newline at end of file
+        )
+
+@router.get("/api/properties/{property_id}")
+async def get_property(property_id: int):
+    """Full Tokko listing, fetched on demand (the snapshot only keeps PropertyRecords)"""
+    try:
+        assistant = SimpleAssistant()
+        await assistant.tokko_client.ensure_inventory()
+        # Only listings in the inventory are looked up, so unknown ids never reach Tokko
+        if inventory_cache.get(property_id) is None:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Property not found")
+        detail = await assistant.tokko_client.get_raw_property(property_id)
+        if detail is None:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Property not found")
+        return JSONResponse(content={"status": "success", "data": detail},
+                            headers={"Cache-Control": api_cache_control()})
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Property detail error: {str(e)}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=str(e)
+        )
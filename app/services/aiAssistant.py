@@ -8,6 +8,19 @@ from dotenv import load_dotenv
 from typing import Dict, Optional, Any  # Added Any to imports
 import logging
 from app.config import settings  # Add settings import
+from app.services.tokkoClient import TokkoClient as AsyncTokkoClient
+from app.services.inventorySync import InventorySync
+from app.services.snapshotStore import SnapshotError, open_snapshot, write_snapshot
+from app.services.propertyRecord import PropertyRecord
+from app.services.propertyIndex import PropertyIndex, normalize_search_params
+from app.services.cache import result_cache
+from app.services.cardRenderer import CardCache
+from app.services.exchangeRates import exchange_rates
+from app.services.tokkoMetadata import metadata_store
+from app.services.runEngine import RunEngine, OpenAIError
+from app.services.assistantRegistry import AssistantRegistry
+from app.services.slotExtractor import SlotExtraction, extract_slots
+from app.services.textNormalize import tokens
 
 # Enhanced logging configuration
 logging.basicConfig(
@@ -42,88 +55,191 @@ def format_property_info(prop: Dict) -> str:
         f"  Description: {prop.get('description', 'No description')[:100]}...\n"
     )
 
-class PropertyCache:
-    def __init__(self):
-        self.properties = []
-        self.last_updated = None
-        self.rental_properties = []
-        self.sale_properties = []
-
-    def needs_update(self) -> bool:
-        # Implement logic to determine if the cache needs to be updated
-        return True
+class InventorySnapshot:
+    """Immutable view of the inventory; replaced as a whole on every sync"""
 
-    def update_cache(self, properties: list):
+    def __init__(self, properties: list, version: int = 0, high_water_mark: Optional[str] = None,
+                 previous: Optional['InventorySnapshot'] = None):
         self.properties = properties
-        self.last_updated = datetime.now()
-        
-        # Separate properties by operation type
+        self.version = version
+        self.high_water_mark = high_water_mark
         self.rental_properties = []
         self.sale_properties = []
         
+        # Separate properties by operation type
         for prop in properties:
-            for operation in prop.get('operations', []):
-                if operation.get('operation_type', '').lower() == 'rent':
+            for operation_type in prop.operation_types:
+                if operation_type.lower() == 'rent':
                     self.rental_properties.append(prop)
                     break
-                elif operation.get('operation_type', '').lower() == 'sale':
+                elif operation_type.lower() == 'sale':
                     self.sale_properties.append(prop)
                     break
 
+        self.by_id = {prop.id: prop for prop in properties}
+        self.index = PropertyIndex(properties, previous.index if previous is not None else None)
+        self.cards = CardCache(properties, previous.cards if previous is not None else None)
+
+class PropertyCache:
+    def __init__(self):
+        self._snapshot = InventorySnapshot([])
+        self._persisted = None
+        self.last_updated = None
+        self.last_full_sync = None
+        self.sync_lock = asyncio.Lock()
+        self.revalidation = None
+
+    @property
+    def snapshot(self) -> InventorySnapshot:
+        # A snapshot restored from disk is only decoded on first use
+        if self._persisted is not None:
+            reader, self._persisted = self._persisted, None
+            try:
+                self._snapshot = InventorySnapshot(reader.load_all(), reader.version, reader.high_water_mark)
+                logger.info(f"Decoded persisted inventory snapshot v{reader.version} ({len(reader)} listings)")
+            except SnapshotError as e:
+                self._discard_persisted(reader, e)
+        return self._snapshot
+
+    @snapshot.setter
+    def snapshot(self, snapshot: InventorySnapshot) -> None:
+        self._persisted = None
+        self._snapshot = snapshot
+
+    def restore(self, path: str) -> bool:
+        """Serve a snapshot persisted by a previous instance until Tokko is reachable"""
+        reader = open_snapshot(path)
+        if reader is None:
+            return False
+        self._persisted = reader
+        self.last_updated = reader.timestamp("last_updated")
+        self.last_full_sync = reader.timestamp("last_full_sync")
+        return True
+
+    def _discard_persisted(self, reader, error: SnapshotError) -> None:
+        """Drop a restored snapshot that failed to decode and go cold until the next full sync"""
+        logger.error(f"Discarding persisted inventory snapshot: {str(error)}")
+        reader.close()
+        self._persisted = None
+        self._snapshot = InventorySnapshot([])
+        self.last_updated = None
+        self.last_full_sync = None
+
+    def persist(self, path: str) -> int:
+        """Write the current snapshot to disk; returns the file size"""
+        snapshot = self.snapshot
+        return write_snapshot(path, snapshot.properties, {
+            "version": snapshot.version,
+            "high_water_mark": snapshot.high_water_mark,
+            "last_updated": self.last_updated.isoformat() if self.last_updated else None,
+            "last_full_sync": self.last_full_sync.isoformat() if self.last_full_sync else None
+        })
+
+    @property
+    def properties(self) -> list:
+        return self.snapshot.properties
+
+    @property
+    def rental_properties(self) -> list:
+        return self.snapshot.rental_properties
+
+    @property
+    def sale_properties(self) -> list:
+        return self.snapshot.sale_properties
+
+    @property
+    def high_water_mark(self) -> Optional[str]:
+        source = self._persisted or self._snapshot
+        return source.high_water_mark
+
+    @property
+    def version(self) -> int:
+        source = self._persisted or self._snapshot
+        return source.version
+
+    def is_loaded(self) -> bool:
+        return self.last_updated is not None
+
+    def snapshot_age(self) -> Optional[float]:
+        """Seconds since the snapshot was last confirmed against Tokko"""
+        if self.last_updated is None:
+            return None
+        return (datetime.now() - self.last_updated).total_seconds()
+
+    def needs_update(self) -> bool:
+        """Whether the delta sync interval has elapsed since the last sync"""
+        if self.last_updated is None:
+            return True
+        return self.snapshot_age() >= settings.inventory_delta_sync_seconds
+
+    def needs_full_sync(self) -> bool:
+        """Whether a scheduled full resync is due"""
+        if self.last_full_sync is None or self.high_water_mark is None:
+            return True
+        elapsed = (datetime.now() - self.last_full_sync).total_seconds()
+        return elapsed >= settings.inventory_full_sync_minutes * 60
+
+    async def update_cache(self, properties: list):
+        records = await asyncio.to_thread(lambda: [PropertyRecord.from_tokko(prop) for prop in properties])
+        await self._replace(records)
+        self.last_full_sync = datetime.now()
+
+    async def apply_delta(self, changed: list) -> None:
+        """Apply inserts, updates and tombstones from a delta sync"""
+        if not changed:
+            self.last_updated = datetime.now()
+            return
+        properties = await asyncio.to_thread(self._merge_delta, self.properties, changed)
+        await self._replace(properties)
+
+    @staticmethod
+    def _merge_delta(current: list, changed: list) -> list:
+        by_id = {record.id: record for record in current}
+        inserted = updated = removed = 0
+
+        for prop in changed:
+            prop_id = prop.get('id')
+            if prop.get('status') not in settings.tokko_active_statuses:
+                if by_id.pop(prop_id, None) is not None:
+                    removed += 1
+            elif prop_id in by_id:
+                by_id[prop_id] = PropertyRecord.from_tokko(prop)
+                updated += 1
+            else:
+                by_id[prop_id] = PropertyRecord.from_tokko(prop)
+                inserted += 1
+
+        logger.info(f"Delta applied: {inserted} inserted, {updated} updated, {removed} removed")
+        return list(by_id.values())
+
+    async def _replace(self, properties: list):
+        previous = self.snapshot
+        markers = [record.change_marker for record in properties]
+        high_water_mark = max(markers + [previous.high_water_mark or '']) or None
+
+        # Build the new snapshot (indexes, columns, cards) off the event loop, then swap the reference on it
+        snapshot = await asyncio.to_thread(
+            InventorySnapshot, properties, previous.version + 1, high_water_mark, previous=previous
+        )
+        self.snapshot = snapshot
+        self.last_updated = datetime.now()
+
+    def get(self, property_id: int) -> Optional[PropertyRecord]:
+        """One listing by id; a restored snapshot is read without decoding it all"""
+        if self._persisted is not None:
+            try:
+                return self._persisted.get(property_id)
+            except SnapshotError as e:
+                self._discard_persisted(self._persisted, e)
+                return None
+        return self.snapshot.by_id.get(property_id) if self.is_loaded() else None
+
     def filter_properties(self, search_params: Dict) -> list:
-        """Filter properties based on search parameters"""
-        # First, select the correct property pool based on operation type
-        if search_params.get('operation_type') == 'Rent':
-            property_pool = self.rental_properties
-        elif search_params.get('operation_type') == 'Sale':
-            property_pool = self.sale_properties
-        else:
-            property_pool = self.properties
-
-        filtered = []
-        for prop in property_pool:
-            matches = True
-            
-            # Filter by property type
-            if search_params.get('property_type'):
-                prop_type = search_params['property_type'].lower()
-                if prop.get('type', {}).get('name', '').lower() != prop_type:
-                    matches = False
-            
-            # Filter by location
-            if matches and search_params.get('location'):
-                location = search_params['location'].lower()
-                prop_location = prop.get('location', {}).get('name', '').lower()
-                if location not in prop_location:
-                    matches = False
-            
-            # Update room filtering to use minimum rooms
-            if matches and search_params.get('min_rooms'):
-                min_rooms = search_params['min_rooms']
-                prop_rooms = prop.get('room_amount', 0)
-                if prop_rooms < min_rooms:  # Changed from exact match to minimum
-                    matches = False
-            
-            # Filter by price
-            if matches and search_params.get('max_price'):
-                max_price = search_params.get('max_price')
-                currency = search_params.get('currency', 'USD')
-                
-                # Get property price
-                for operation in prop.get('operations', []):
-                    if operation.get('operation_type') == search_params.get('operation_type'):
-                        prices = operation.get('prices', [])
-                        if prices:
-                            price = prices[0]
-                            if (price.get('currency') == currency and 
-                                price.get('price', float('inf')) > max_price):
-                                matches = False
-                            break
-            
-            if matches:
-                filtered.append(prop)
-        
-        return filtered
+        """Filter properties based on search parameters, best matches first"""
+        return self.snapshot.index.query(search_params, ranked=True)
+
+# Process-wide inventory shared by every TokkoClient and the background refresher
+inventory_cache = PropertyCache()
 
 class TokkoClient:
     def __init__(self, api_key: str = None):
@@ -133,71 +249,42 @@ class TokkoClient:
             "Content-Type": "application/json",
             "Accept": "application/json"
         }
-        self.cache = PropertyCache()
+        self.cache = inventory_cache
+        self._transport = None
+        self.inventory_params = {"active": "True"}  # Only get active listings
         logger.info("Tokko Client initialized with cache")
 
-    def get_api_metadata(self) -> Dict:
-        """Get all available metadata from the API"""
-        try:
-            logger.info("\n=== Fetching API Metadata ===")
-            
-            # Get property types
-            url = f"{self.base_url}/property/property_types/"
-            params = {"key": self.api_key, "format": "json", "lang": "es"}
-            response = requests.get(url, params=params, headers=self.headers)
-            self.property_types = response.json()
-            logger.info(f"Property Types: {json.dumps(self.property_types, indent=2)}")
-
-            # Get operation types
-            url = f"{self.base_url}/property/operation_types/"
-            response = requests.get(url, params=params, headers=self.headers)
-            self.operation_types = response.json()
-            logger.info(f"Operation Types: {json.dumps(self.operation_types, indent=2)}")
-
-            # Get available tags
-            url = f"{self.base_url}/property/tags/"
-            response = requests.get(url, params=params, headers=self.headers)
-            self.tags = response.json()
-            logger.info(f"Available Tags: {json.dumps(self.tags, indent=2)}")
-
-            return {
-                "property_types": self.property_types,
-                "operation_types": self.operation_types,
-                "tags": self.tags
-            }
-
-        except requests.exceptions.RequestException as e:
-            logger.error(f"Failed to fetch API metadata: {str(e)}")
-            return {"error": str(e)}
-
-    def search_properties(self, search_params: Dict = None) -> Dict:
+    @property
+    def transport(self) -> AsyncTokkoClient:
+        """The lifespan's shared transport (one session, flight group and breaker);
+        a private one only when running outside the app"""
+        if settings.tokko_client is not None:
+            return settings.tokko_client
+        if self._transport is None:
+            self._transport = AsyncTokkoClient()
+        return self._transport
+
+    async def get_api_metadata(self) -> Dict:
+        """Property types, operation types and tags, refreshed from Tokko when stale"""
+        await metadata_store.refresh_if_due(self.transport)
+        return metadata_store.current.to_dict()
+
+    async def search_properties(self, search_params: Dict = None) -> Dict:
         try:
             logger.info("\n=== Tokko Search ===")
             logger.info(f"Search parameters: {search_params}")
             
-            # Initial API call to get all properties
-            if self.cache.needs_update():
-                url = f"{self.base_url}/property/"
-                params = {
-                    "key": self.api_key,
-                    "format": "json",
-                    "lang": "es",
-                    "limit": 100,
-                    "active": True  # Only get active listings
-                }
-                
-                logger.info("Fetching properties from Tokko API...")
-                response = requests.get(url, params=params, headers=self.headers)
-                response.raise_for_status()
-                data = response.json()
-                
-                if data.get('objects'):
-                    self.cache.update_cache(data['objects'])
-                    logger.info(f"Cache updated with {len(data['objects'])} properties")
+            # Serve the current snapshot; only a cold cache waits on Tokko
+            await self.ensure_inventory()
             
             # Filter properties based on search parameters
             if search_params:
-                filtered = self.cache.filter_properties(search_params)
+                # Results are only valid for the snapshot and rates they were computed on
+                key = (self.cache.version, exchange_rates.version, normalize_search_params(search_params))
+                filtered = result_cache.get(key, "search")
+                if filtered is None:
+                    filtered = self.cache.filter_properties(search_params)
+                    result_cache.set(key, filtered, "search")
                 logger.info(f"Found {len(filtered)} matching properties")
                 logger.info(f"Operation type: {search_params.get('operation_type')}")
                 logger.info(f"Property type: {search_params.get('property_type')}")
@@ -208,16 +295,84 @@ class TokkoClient:
                     "total": len(filtered)
                 }
             
+            properties = self.cache.properties
             return {
-                "count": len(self.cache.properties),
-                "properties": self.cache.properties,
-                "total": len(self.cache.properties)
+                "count": len(properties),
+                "properties": properties,
+                "total": len(properties)
             }
 
         except Exception as e:
             logger.error(f"Search failed: {str(e)}", exc_info=True)
             return {"error": str(e)}
 
+    async def get_raw_property(self, property_id: int) -> Optional[Dict[str, Any]]:
+        """Full Tokko object for a listing (the cache only keeps PropertyRecords);
+        the snapshot record when Tokko is unavailable"""
+        detail = await result_cache.get_or_compute(
+            str(property_id),
+            lambda: self.transport.get_property_detail(str(property_id)),
+            namespace="detail",
+            ttl=settings.property_detail_ttl_seconds,
+            cache_if=lambda detail: detail is not None
+        )
+        if detail is None:
+            # Tokko failed or its circuit is open: fall back to the local snapshot
+            record = self.cache.get(property_id)
+            return record.to_dict() if record is not None else None
+        return detail
+
+    async def ensure_inventory(self) -> None:
+        """Load the inventory on a cold cache, otherwise revalidate in the background"""
+        if not self.cache.is_loaded():
+            # Concurrent cold requests (and the refresher) share a single sync
+            await self.sync_inventory()
+            return
+
+        refresher = settings.inventory_refresher
+        if refresher is not None and refresher.is_running():
+            refresher.warn_if_stale()
+        elif (self.cache.needs_update() and not self.cache.sync_lock.locked()
+              and self.transport.resilience.breaker.state != "open"):
+            # Keep a reference so the task is not garbage collected mid-flight
+            self.cache.revalidation = asyncio.create_task(self._revalidate())
+
+    async def _revalidate(self) -> None:
+        try:
+            await self.sync_inventory()
+        except Exception as e:
+            logger.warning(f"Background inventory sync failed, serving stale snapshot "
+                           f"(age {self.cache.snapshot_age():.0f}s): {str(e)}")
+
+    async def sync_inventory(self) -> None:
+        """Run one sync, serialized with any other sync of the shared cache.
+        Callers arriving while a sync is in flight share it instead of queueing another."""
+        await self.transport.flights.do(("inventory-sync",), self._locked_sync)
+
+    async def _locked_sync(self) -> None:
+        async with self.cache.sync_lock:
+            await self._sync_inventory()
+
+    async def _sync_inventory(self) -> None:
+        """Run a delta sync against the cached inventory, or a full sync when due"""
+        sync = InventorySync(self.transport)
+
+        if not self.cache.needs_full_sync():
+            delta = await sync.fetch_changes(self.cache.high_water_mark, self.inventory_params)
+            if delta is not None:
+                await self.cache.apply_delta(delta["changed"])
+                # Listings that vanished from the feed never show up in a delta
+                if len(self.cache.properties) == delta["total"]:
+                    return
+                logger.info(f"Delta sync count mismatch ({len(self.cache.properties)} cached, "
+                            f"{delta['total']} upstream), running full sync")
+
+        logger.info("Fetching properties from Tokko API...")
+        properties = await sync.fetch_all(self.inventory_params)
+        if properties:
+            await self.cache.update_cache(properties)
+            logger.info(f"Cache updated with {len(properties)} properties")
+
     def _get_simple_listing(self) -> Dict:
         """Get simple property listing"""
         try:
@@ -230,121 +385,6 @@ class TokkoClient:
             logger.error(f"Simple listing failed: {str(e)}")
             return {"error": str(e)}
 
-    def _format_property_with_photos(self, prop: Dict) -> str:
-        try:
-            # Get operation and price info
-            price_info = ""
-            operation_type = ""
-            for op in prop.get('operations', []):
-                prices = op.get('prices', [])
-                if prices:
-                    price = prices[0]
-                    price_info = f"{price.get('currency', 'ARS')} {price.get('price', 'N/A'):,}"
-                    operation_type = op.get('operation_type', 'N/A')
-                    break
-
-            # Format property details in HTML/CSS friendly way
-            property_html = f"""
-            <div class="property-card">
-                <h3 class="property-title">
-                    {prop.get('publication_title', 'Propiedad Destacada')}
-                </h3>
-                
-                <div class="property-location">
-                    <i class="fas fa-map-marker-alt"></i>
-                    {prop.get('address', 'Consultar dirección')}
-                </div>
-                
-                <div class="property-details">
-                    <div class="detail-item">
-                        <i class="fas fa-dollar-sign"></i>
-                        <span>{price_info}</span>
-                    </div>
-                    <div class="detail-item">
-                        <i class="fas fa-home"></i>
-                        <span>{operation_type}</span>
-                    </div>
-                    <div class="detail-item">
-                        <i class="fas fa-bed"></i>
-                        <span>{prop.get('room_amount', 'N/A')} Ambientes</span>
-                    </div>
-                    <div class="detail-item">
-                        <i class="fas fa-bath"></i>
-                        <span>{prop.get('bathroom_amount', 'N/A')} Baños</span>
-                    </div>
-                    <div class="detail-item">
-                        <i class="fas fa-ruler-combined"></i>
-                        <span>{prop.get('total_surface', 'N/A')} m²</span>
-                    </div>
-                </div>
-            """
-
-            # Add amenities if available
-            amenities = []
-            if prop.get('parking_amount'):
-                amenities.append('<i class="fas fa-car"></i> Cochera')
-            if prop.get('balcony_amount'):
-                amenities.append('<i class="fas fa-sun"></i> Balcón')
-            if prop.get('has_pool'):
-                amenities.append('<i class="fas fa-swimming-pool"></i> Pileta')
-            if prop.get('accepts_pets'):
-                amenities.append('<i class="fas fa-paw"></i> Acepta mascotas')
-
-            if amenities:
-                property_html += f"""
-                <div class="property-details">
-                    {''.join(f'<div class="detail-item">{amenity}</div>' for amenity in amenities)}
-                </div>
-                """
-
-            # Add photos
-            photo_urls = []
-            for photo in prop.get('photos', [])[:3]:
-                if photo.get('image'):
-                    photo_urls.append(photo['image']['url'] if isinstance(photo['image'], dict) else photo['image'])
-
-            if photo_urls:
-                property_html += f"""
-                <div class="property-photos">
-                    {''.join(f'<img src="{url}" alt="Foto de propiedad" loading="lazy">' for url in photo_urls)}
-                </div>
-                """
-
-            # Add description
-            description = prop.get('description', '').strip()
-            if description:
-                preview = description[:200] + "..." if len(description) > 200 else description
-                property_html += f"""
-                <div class="property-description">
-                    {preview}
-                </div>
-                """
-
-            # Add link to full property
-            public_url = prop.get('public_url')
-            if public_url:
-                property_html += f"""
-                <a href="{public_url}" class="property-link" target="_blank">
-                    <i class="fas fa-external-link-alt"></i>
-                    Ver Propiedad Completa
-                </a>
-                """
-
-            property_html += """
-                <hr class="property-separator">
-            </div>
-            """
-
-            return property_html
-
-        except Exception as e:
-            logger.error(f"Error formatting property: {str(e)}")
-            return '<div class="error-message">❌ Error al formatear la propiedad</div>'
-
-class OpenAIError(Exception):
-    """Custom exception for OpenAI specific errors"""
-    pass
-
 class SimpleAssistant:
     _instance = None
     _assistant_id = None
@@ -353,28 +393,31 @@ class SimpleAssistant:
     def __init__(self):
         self.client = settings.openai_client
         self.tokko_client = TokkoClient()  # Add TokkoClient initialization
-        self.polling_interval = 2.0  # Increased base interval
-        self.max_attempts = 120  # Allow more attempts
         self.max_threads = 10
+        self.runs = RunEngine(self.client, self._execute_tool_calls)
+        self.registry = AssistantRegistry(self.client, self._assistant_definition())
+        self._background = set()
 
     @classmethod
     async def get_instance(cls) -> 'SimpleAssistant':
         if not cls._instance:
             cls._instance = cls()
+        if not cls._instance._assistant_id:
             await cls._instance.initialize()
         return cls._instance
 
     async def initialize(self) -> None:
-        """Initialize the assistant (only if needed)"""
+        """Resolve the assistant through the registry (only if needed)"""
         if not self._assistant_id:
-            self._assistant_id = await self._create_assistant()
+            self._assistant_id = await self.registry.resolve()
             logger.info("Assistant initialized with ID: %s", self._assistant_id)
 
-    async def _create_assistant(self) -> str:
-        try:
-            assistant = await self.client.beta.assistants.create(
-                name="Real Estate Assistant",
-                instructions="""Sos un asistente inmobiliario profesional para Altamirano Properties en Argentina.
+    @staticmethod
+    def _assistant_definition() -> Dict[str, Any]:
+        """Name, instructions, model and tools; a change here updates the stored assistant"""
+        return dict(
+            name="Real Estate Assistant",
+            instructions="""Sos un asistente inmobiliario profesional para Altamirano Properties en Argentina.
 
             COMPORTAMIENTO:
             - Usar español argentino siempre (vos, che, etc.)
@@ -410,12 +453,8 @@ class SimpleAssistant:
             → Entender: property_type="Apartment", rooms=2, location="Villa Ballester"
             → Preguntar: "¿Estás buscando para alquilar o comprar?"
 
-            ZONAS CONOCIDAS:
-            - "ballester" = "Villa Ballester"
-            - "malaver" = "Villa Malaver"
-            - "chilavert" = "Chilavert"
-            - "suarez" = "José León Suárez"
-            - "san martin" = "San Martín"
+            UBICACIONES:
+            - Pasar la zona tal como la dice el usuario (ej. "ballester", "suarez"); la búsqueda resuelve alias y acentos
 
             TÉRMINOS ARGENTINOS:
             - "depto/departamento" = Apartment
@@ -423,30 +462,40 @@ class SimpleAssistant:
             - "expensas" = gastos comunes
             - "cochera" = parking
             - "PH" = tipo especial de departamento""",
-                model="gpt-3.5-turbo",
-                tools=[{
-                    "type": "function",
-                    "function": {
-                        "name": "search_properties",
-                        "description": "Search for properties based on criteria",
-                        "parameters": {
-                            "type": "object",
-                            "properties": {
-                                "location": {"type": "string"},
-                                "operation_type": {"type": "string", "enum": ["Rent", "Sale"]},
-                                "property_type": {"type": "string", "enum": ["Apartment", "House", "Office", "Local"]},
-                                "rooms": {"type": "integer", "minimum": 1},
-                                "max_price": {"type": "number"}
+            model="gpt-3.5-turbo",
+            tools=[{
+                "type": "function",
+                "function": {
+                    "name": "search_properties",
+                    "description": "Search for properties based on criteria",
+                    "parameters": {
+                        "type": "object",
+                        "properties": {
+                            "location": {"type": "string"},
+                            "operation_type": {"type": "string", "enum": ["Rent", "Sale"]},
+                            "property_type": {"type": "string", "enum": ["Apartment", "House", "Office", "Local"]},
+                            "rooms": {"type": "integer", "minimum": 1},
+                            "max_price": {"type": "number"},
+                            "currency": {
+                                "type": "string",
+                                "enum": ["ARS", "USD"],
+                                "description": "Moneda de max_price; se compara contra precios en cualquier moneda"
+                            },
+                            "keywords": {
+                                "type": "string",
+                                "description": "Características pedidas en texto libre, ej. 'balcón al frente', 'apto crédito', 'entrega inmediata'"
+                            },
+                            "near": {
+                                "type": "string",
+                                "description": "Punto de referencia para buscar cerca: zona, lugar conocido o 'lat,long'"
                             },
-                            "required": ["location", "operation_type", "property_type"]
-                        }
+                            "radius_km": {"type": "number", "minimum": 0.1, "maximum": 50}
+                        },
+                        "required": ["location", "operation_type", "property_type"]
                     }
-                }]
-            )
-            return assistant.id
-        except Exception as e:
-            logger.error("Failed to create assistant: %s", str(e))
-            raise
+                }
+            }]
+        )
 
     async def _get_or_create_thread(self) -> str:
         """Create a new thread or clean up old ones"""
@@ -466,6 +515,49 @@ class SimpleAssistant:
             raise OpenAIError(f"Failed to create thread: {str(e)}")
 
     async def chat(self, message: str, thread_id: str = None) -> dict:
+        extraction = await self._extract_slots(message)
+        # Only first turns are shared: later turns depend on their thread's history
+        cache_key = self._response_cache_key(message, extraction) if thread_id is None else None
+        if cache_key is not None:
+            cached = result_cache.get(cache_key, "chat")
+            if cached is not None:
+                logger.info(f"Chat response cache hit: {message}")
+                # Seed a thread with the exchange (no run, no search) so the next turn has context
+                thread = await self._record_exchange(None, message, cached["content"])
+                return {**cached, "thread_id": thread, "source": "cache"}
+
+        response = None
+        if settings.slot_fast_path_enabled and extraction is not None:
+            response = await self._answer_locally(message, thread_id, extraction)
+        if response is None:
+            response = await self._run_model(message, thread_id)
+
+        if cache_key is not None and response.get("status") == "completed":
+            cached = {key: response[key] for key in ("content", "status", "function_output") if key in response}
+            result_cache.set(cache_key, cached, "chat", ttl=settings.chat_cache_ttl_seconds)
+        return response
+
+    async def _extract_slots(self, message: str) -> Optional[SlotExtraction]:
+        """Slots of the message against the current snapshot; None while the inventory is unavailable"""
+        try:
+            await self.tokko_client.ensure_inventory()
+        except Exception as e:
+            logger.warning(f"Slot extraction skipped, inventory unavailable: {str(e)}")
+            return None
+        return extract_slots(message, metadata_store.current, self.tokko_client.cache.snapshot.index.locations)
+
+    def _response_cache_key(self, message: str, extraction: Optional[SlotExtraction]) -> Optional[tuple]:
+        """Canonical message (folded, sorted tokens) and its slots, scoped to the snapshot and rates"""
+        if not settings.chat_cache_enabled or extraction is None:
+            return None
+        return (
+            self.tokko_client.cache.version,
+            exchange_rates.version,
+            tuple(sorted(tokens(message))),
+            normalize_search_params(extraction.search_params())
+        )
+
+    async def _run_model(self, message: str, thread_id: Optional[str]) -> dict:
         try:
             current_thread = thread_id or await self._get_or_create_thread()
             
@@ -480,79 +572,18 @@ class SimpleAssistant:
                 content=message
             )
 
-            # Create run
-            run = await self.client.beta.threads.runs.create(
-                thread_id=current_thread,
-                assistant_id=self._assistant_id
-            )
-            
-            logger.info(f"Run ID: {run.id}")
-
-            attempts = 0
-            while attempts < self.max_attempts:
-                try:
-                    status = await self.client.beta.threads.runs.retrieve(
-                        thread_id=current_thread,
-                        run_id=run.id
-                    )
-                    
-                    if status.status == "completed":
-                        messages = await self.client.beta.threads.messages.list(
-                            thread_id=current_thread,
-                            limit=10
-                        )
-                        
-                        response = {
-                            "content": messages.data[0].content[0].text.value,
-                            "thread_id": current_thread,
-                            "status": status.status
-                        }
-                        
-                        return response
-
-                    if status.status in ["failed", "cancelled", "expired"]:
-                        error_msg = f"OpenAI run {status.status}"
-                        if hasattr(status, 'last_error'):
-                            error_msg += f": {status.last_error}"
-                        logger.error(error_msg)
-                        raise OpenAIError(error_msg)
-
-                    if status.status == "requires_action":
-                        logger.info("Run requires action - checking tool calls")
-                        tool_outputs = await self._handle_tool_calls(status, current_thread, run.id)
-                        logger.info(f"Tool outputs: {json.dumps(tool_outputs, indent=2)}")
-                        
-                        # Include function output in response
-                        if tool_outputs:
-                            response = {
-                                "content": "",  # Will be updated with final message
-                                "thread_id": current_thread,
-                                "status": status.status,
-                                "function_output": tool_outputs[0]["output"]
-                            }
-                            return response
-
-                    await asyncio.sleep(self.polling_interval)
-                    attempts += 1
-
-                except Exception as e:
-                    if "429" in str(e):
-                        logger.warning("Rate limit hit, waiting...")
-                        await asyncio.sleep(5)
-                        continue
-                    raise
-
-            raise OpenAIError("OpenAI request timed out")
+            # Stream the run; tool calls are answered on the same stream
+            return await self.runs.run(current_thread, self._assistant_id)
 
         except Exception as e:
             logger.error(f"Chat error: {str(e)}")
             raise
 
-    async def _handle_tool_calls(self, run_status, thread_id: str, run_id: str) -> list:
-        """Handle tool calls from the assistant"""
+    async def _execute_tool_calls(self, tool_calls: list) -> list:
+        """Run the assistant's tool calls; the run engine submits the outputs"""
         tool_outputs = []
         
-        for tool_call in run_status.required_action.submit_tool_outputs.tool_calls:
+        for tool_call in tool_calls:
             try:
                 logger.info(f"Processing tool call: {tool_call.function.name}")
                 
@@ -567,58 +598,15 @@ class SimpleAssistant:
                         'operation_type': args.get('operation_type'),
                         'property_type': args.get('property_type'),
                         'min_rooms': args.get('rooms'),
-                        'max_price': args.get('max_price')
+                        'max_price': args.get('max_price'),
+                        'currency': args.get('currency'),
+                        'keywords': args.get('keywords'),
+                        'near': args.get('near'),
+                        'radius_km': args.get('radius_km')
                     }
                     
                     logger.info(f"Searching with params: {search_params}")
-                    
-                    # Execute the search
-                    search_results = self.tokko_client.search_properties(search_params)
-                    
-                    if "error" in search_results:
-                        logger.error(f"Search error: {search_results['error']}")
-                        output = {
-                            "type": "error",
-                            "message": search_results["error"]
-                        }
-                    else:
-                        properties = search_results.get("properties", [])
-                        formatted_properties = []
-                        
-                        for prop in properties:
-                            # Get operation details
-                            operation = next((op for op in prop.get('operations', []) 
-                                            if op.get('prices')), {})
-                            
-                            # Format price
-                            price_info = "Consultar"
-                            if operation and operation.get('prices'):
-                                price = operation['prices'][0]
-                                price_info = f"{price.get('currency', 'ARS')} {price.get('price', 'Consultar'):,}"
-                            
-                            # Format property
-                            formatted_prop = {
-                                "title": prop.get('publication_title', 'Propiedad'),
-                                "address": prop.get('fake_address', 'Consultar dirección'),
-                                "operation_type": operation.get('operation_type', 'N/D'),
-                                "property_type": prop.get('type', {}).get('name', 'N/D'),
-                                "price": price_info,
-                                "rooms": prop.get('room_amount', 'N/D'),
-                                "surface": f"{prop.get('total_surface', 'N/D')} m²",
-                                "expenses": f"ARS {prop.get('expenses', 0):,}",
-                                "description": prop.get('description', '').strip(),
-                                "image_url": next((p['image'] for p in prop.get('photos', []) 
-                                                 if p.get('image')), None),
-                                "url": prop.get('public_url', '')
-                            }
-                            formatted_properties.append(formatted_prop)
-                        
-                        logger.info(f"Found {len(formatted_properties)} properties")
-                        output = {
-                            "type": "properties",
-                            "data": formatted_properties,
-                            "count": len(formatted_properties)
-                        }
+                    output = await self._search_output(search_params)
                     
                     tool_outputs.append({
                         "tool_call_id": tool_call.id,
@@ -639,55 +627,91 @@ class SimpleAssistant:
                     "output": json.dumps({"error": str(e)})
                 })
         
-        # Submit all tool outputs
-        if tool_outputs:
-            await self.client.beta.threads.runs.submit_tool_outputs(
-                thread_id=thread_id,
-                run_id=run_id,
-                tool_outputs=tool_outputs
-            )
-        
         return tool_outputs
 
-    def format_property_response(self, properties: list) -> str:
-        """Format properties into a structured markdown response."""
-        formatted = []
-        for idx, prop in enumerate(properties, 1):
-            # Get operation details
-            operation = next((op for op in prop.get('operations', []) 
-                            if op.get('prices')), {})
-            
-            # Get the first price if available
-            price_data = next(iter(operation.get('prices', [])), {})
-            price = f"{price_data.get('price', 'Consultar'):,}" if price_data else 'Consultar'
-            
-            # Format property text with full details
-            property_text = (
-                f"{idx}. **{prop.get('publication_title', 'Departamento')}**\n"
-                f"   - Operación: {operation.get('operation_type', 'N/D')}\n"
-                f"   - Tipo: {prop.get('type', {}).get('name', 'Departamento')}\n"
-                f"   - Precio: ${price}\n"
-                f"   - Ambientes: {prop.get('room_amount', 'N/D')}\n"
-                f"   - Superficie: {prop.get('total_surface', 'N/D')} m2\n"
-                f"   - Expensas: ${prop.get('expenses', 0):,}\n"
-                f"   - Descripción: {prop.get('description', 'Sin descripción')}\n"
-            )
+    async def _search_output(self, search_params: Dict) -> Dict:
+        """search_properties tool output: card summaries of the matches, or the error"""
+        search_results = await self.tokko_client.search_properties(search_params)
+        
+        if "error" in search_results:
+            logger.error(f"Search error: {search_results['error']}")
+            return {
+                "type": "error",
+                "message": search_results["error"]
+            }
 
-            # Add photos if available
-            if prop.get('photos'):
-                first_photo = prop['photos'][0]
-                image_url = first_photo.get('image', {}).get('url', '') if isinstance(first_photo.get('image'), dict) else first_photo.get('image', '')
-                if image_url:
-                    property_text += f"   - imagen:{image_url}\n"
+        properties = search_results.get("properties", [])
+        # Summaries are pre-rendered per listing at sync time
+        cards = self.tokko_client.cache.snapshot.cards
+        formatted_properties = cards.summaries(prop.id for prop in properties)
+        
+        logger.info(f"Found {len(formatted_properties)} properties")
+        return {
+            "type": "properties",
+            "data": formatted_properties,
+            "count": len(formatted_properties)
+        }
 
-            # Add link to property
-            if prop.get('public_url'):
-                property_text += f"   - [Ver más detalles]({prop['public_url']})\n"
+    async def _answer_locally(self, message: str, thread_id: Optional[str],
+                              extraction: SlotExtraction) -> Optional[dict]:
+        """Answer a fully specified search from the local index, without a run.
+
+        Returns None (use the model) when a required slot is missing or
+        ambiguous, the message asks for more than the parser understands, or
+        nothing matches.
+        """
+        if not extraction.complete or extraction.confidence < settings.slot_fast_path_min_confidence:
+            logger.info(f"Slots incomplete or uncertain ({extraction.confidence:.2f}, unexplained: {extraction.unexplained}); using the model")
+            return None
+
+        search_params = extraction.search_params()
+        output = await self._search_output(search_params)
+        if output.get("type") != "properties" or not output["count"]:
+            return None
+
+        logger.info(f"Answered locally with {output['count']} properties: {search_params}")
+        listed = "\n".join(f"{position}. {prop['title']} - {prop['price']} (id {prop['id']})"
+                            for position, prop in enumerate(output["data"][:10], 1))
+        content = f"Encontré {output['count']} propiedades que coinciden con tu búsqueda:\n{listed}"
+        return {
+            "content": content,
+            "thread_id": await self._record_exchange(thread_id, message, content),
+            "status": "completed",
+            "function_output": json.dumps(output, ensure_ascii=False),
+            "source": "local"
+        }
 
-            formatted.append(property_text)
-        
-        # Join all properties with double newlines for better readability
-        return "\n\n".join(formatted)
+    async def _record_exchange(self, thread_id: Optional[str], message: str, reply: str) -> Optional[str]:
+        """Keep a locally answered turn on the thread so the model has it as context later"""
+        try:
+            if thread_id is None:
+                thread = await self.client.beta.threads.create(messages=[
+                    {"role": "user", "content": message},
+                    {"role": "assistant", "content": reply}
+                ])
+                self._threads_cache[thread.id] = datetime.now()
+                return thread.id
+
+            async def append():
+                try:
+                    for role, content in (("user", message), ("assistant", reply)):
+                        await self.client.beta.threads.messages.create(thread_id=thread_id, role=role, content=content)
+                except Exception as e:
+                    logger.warning(f"Could not record local answer on thread {thread_id}: {str(e)}")
+
+            # Existing thread: the reply does not need to wait for the bookkeeping
+            task = asyncio.create_task(append())
+            self._background.add(task)
+            task.add_done_callback(self._background.discard)
+            return thread_id
+        except Exception as e:
+            logger.warning(f"Could not record local answer: {str(e)}")
+            return thread_id
+
+    def format_property_response(self, properties: list) -> str:
+        """Format properties into a structured markdown response."""
+        cards = self.tokko_client.cache.snapshot.cards
+        return cards.markdown(prop.id for prop in properties)
 
     def search_properties(self, args):
         search_params = {
@@ -700,7 +724,7 @@ class SimpleAssistant:
         }
 
 # Add to top of file if not already present
-__all__ = ['SimpleAssistant', 'OpenAIError']
+__all__ = ['SimpleAssistant', 'OpenAIError', 'inventory_cache']
 
 # Example usage
 if __name__ == "__main__":
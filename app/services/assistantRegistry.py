@@ -0,0 +1,106 @@
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import uuid
+from typing import Any, Dict, Optional
+from openai import NotFoundError
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Metadata key/value that marks assistants owned by this app
+APP_KEY = "altamirano"
+
+def definition_hash(definition: Dict[str, Any]) -> str:
+    """Stable digest of the assistant's name, instructions, model and tool schema"""
+    canonical = json.dumps(definition, sort_keys=True, ensure_ascii=False, separators=(',', ':'))
+    return hashlib.sha256(canonical.encode('utf-8')).hexdigest()[:32]
+
+class AssistantRegistry:
+    """Finds the OpenAI assistant for a definition instead of creating one per process.
+
+    Lookup order: the configured openai_assistant_id, the id recorded in the
+    local registry file, then the newest assistants in the account tagged
+    with this app (or carrying its name). The assistant is only updated when
+    its stored definition hash differs, and only created when none exists.
+    """
+
+    def __init__(self, client, definition: Dict[str, Any], path: Optional[str] = None):
+        self.client = client
+        self.definition = definition
+        self.hash = definition_hash(definition)
+        self.path = path or settings.assistant_registry_path
+        self._lock = asyncio.Lock()
+
+    def _metadata(self) -> Dict[str, str]:
+        return {"app": APP_KEY, "definition_hash": self.hash}
+
+    def _read(self) -> Dict[str, str]:
+        if not self.path or not os.path.exists(self.path):
+            return {}
+        try:
+            with open(self.path, encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError) as e:
+            logger.warning(f"Ignoring assistant registry {self.path}: {str(e)}")
+            return {}
+
+    def _write(self, assistant_id: str) -> None:
+        if not self.path:
+            return
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        tmp_path = f"{self.path}.{uuid.uuid4().hex}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({"assistant_id": assistant_id, "definition_hash": self.hash}, f)
+        os.replace(tmp_path, self.path)
+
+    async def _retrieve(self, assistant_id: str):
+        try:
+            return await self.client.beta.assistants.retrieve(assistant_id)
+        except NotFoundError:
+            logger.warning(f"Assistant {assistant_id} no longer exists")
+            return None
+
+    async def _find(self):
+        """Newest assistant of this app, preferring one already at the current definition"""
+        page = await self.client.beta.assistants.list(limit=100, order="desc")
+        candidates = [assistant for assistant in page.data
+                      if (assistant.metadata or {}).get("app") == APP_KEY
+                      or assistant.name == self.definition.get("name")]
+        current = [assistant for assistant in candidates
+                   if (assistant.metadata or {}).get("definition_hash") == self.hash]
+        return (current or candidates or [None])[0]
+
+    async def _sync(self, assistant) -> str:
+        """Bring an existing assistant to the current definition if it drifted"""
+        if (assistant.metadata or {}).get("definition_hash") != self.hash:
+            logger.info(f"Updating assistant {assistant.id} to definition {self.hash}")
+            await self.client.beta.assistants.update(assistant.id, **self.definition, metadata=self._metadata())
+        return assistant.id
+
+    async def resolve(self) -> str:
+        async with self._lock:
+            assistant = None
+            if settings.openai_assistant_id:
+                assistant = await self._retrieve(settings.openai_assistant_id)
+                if assistant is None:
+                    raise RuntimeError(f"Configured assistant {settings.openai_assistant_id} not found")
+            else:
+                recorded = self._read().get("assistant_id")
+                if recorded:
+                    assistant = await self._retrieve(recorded)
+                if assistant is None:
+                    assistant = await self._find()
+
+            if assistant is not None:
+                assistant_id = await self._sync(assistant)
+                logger.info(f"Reusing assistant {assistant_id}")
+            else:
+                created = await self.client.beta.assistants.create(**self.definition, metadata=self._metadata())
+                assistant_id = created.id
+                logger.info(f"Created assistant {assistant_id}")
+
+            await asyncio.to_thread(self._write, assistant_id)
+            return assistant_id
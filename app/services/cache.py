@@ -1,34 +1,154 @@
-from typing import Dict, Any
-from datetime import datetime, timedelta
+import sys
+import time
 import logging
+from collections import OrderedDict, defaultdict
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional, Tuple
+from app.config.settings import settings
+from .singleFlight import SingleFlight
 
 logger = logging.getLogger(__name__)
 
+_MISSING = object()
+
+def estimate_size(value: Any) -> int:
+    """Rough footprint in bytes: the object plus its direct items (one level deep)"""
+    size = sys.getsizeof(value)
+    if isinstance(value, dict):
+        size += sum(sys.getsizeof(k) + sys.getsizeof(v) for k, v in value.items())
+    elif isinstance(value, (list, tuple, set, frozenset)):
+        size += sum(sys.getsizeof(item) for item in value)
+    return size
+
+class _Entry:
+    __slots__ = ('value', 'expires', 'size')
+
+    def __init__(self, value: Any, expires: float, size: int):
+        self.value = value
+        self.expires = expires
+        self.size = size
+
 class PropertyCache:
-    def __init__(self, ttl_minutes: int = 15):
-        self._cache: Dict[str, Any] = {}
-        self._timestamps: Dict[str, datetime] = {}
-        self.ttl = timedelta(minutes=ttl_minutes)
-        logger.info(f"Property cache initialized with {ttl_minutes} minutes TTL")
+    """Bounded in-memory LRU cache with per-entry TTLs.
+
+    Keys live in namespaces (e.g. "search", "detail") that keep their own
+    hit/miss/eviction counters. Entries expire on a monotonic clock, the
+    least recently used ones are evicted once max_entries or max_bytes is
+    exceeded, and expired entries are swept every sweep_seconds on write.
+    get_or_compute coalesces concurrent misses for the same key.
+    """
 
-    def get(self, key: str) -> Any:
+    def __init__(self, ttl_minutes: float = 15, max_entries: int = 1024,
+                 max_bytes: int = 32 * 1024 * 1024, sweep_seconds: float = 60.0):
+        self._entries: "OrderedDict[Tuple[str, Hashable], _Entry]" = OrderedDict()
+        self.ttl = ttl_minutes * 60
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.sweep_seconds = sweep_seconds
+        self.bytes = 0
+        self._next_sweep = time.monotonic() + sweep_seconds
+        self._stats: Dict[str, Dict[str, int]] = defaultdict(
+            lambda: {"hits": 0, "misses": 0, "evictions": 0, "expirations": 0, "entries": 0, "bytes": 0})
+        self._flights = SingleFlight("cache")
+        logger.info(f"Property cache initialized (ttl={self.ttl:.0f}s, max_entries={max_entries}, "
+                    f"max_bytes={max_bytes})")
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _remove(self, full_key: Tuple[str, Hashable], reason: Optional[str] = None) -> None:
+        entry = self._entries.pop(full_key)
+        self.bytes -= entry.size
+        stats = self._stats[full_key[0]]
+        stats["entries"] -= 1
+        stats["bytes"] -= entry.size
+        if reason:
+            stats[reason] += 1
+
+    def get(self, key: Hashable, namespace: str = "default", default: Any = None) -> Any:
         """Get value from cache if not expired"""
-        if key not in self._cache:
-            return None
-        
-        if datetime.now() - self._timestamps[key] > self.ttl:
-            del self._cache[key]
-            del self._timestamps[key]
-            return None
-            
-        return self._cache[key]
-
-    def set(self, key: str, value: Any) -> None:
-        """Set value in cache with current timestamp"""
-        self._cache[key] = value
-        self._timestamps[key] = datetime.now()
-
-    def clear(self) -> None:
-        """Clear all cached data"""
-        self._cache.clear()
-        self._timestamps.clear()
\ No newline at end of file
+        full_key = (namespace, key)
+        entry = self._entries.get(full_key)
+        stats = self._stats[namespace]
+        if entry is None:
+            stats["misses"] += 1
+            return default
+        if entry.expires <= time.monotonic():
+            self._remove(full_key, "expirations")
+            stats["misses"] += 1
+            return default
+        self._entries.move_to_end(full_key)
+        stats["hits"] += 1
+        return entry.value
+
+    def set(self, key: Hashable, value: Any, namespace: str = "default",
+            ttl: Optional[float] = None, size: Optional[int] = None) -> None:
+        """Store a value for ttl seconds (default: the cache TTL)"""
+        now = time.monotonic()
+        full_key = (namespace, key)
+        if full_key in self._entries:
+            self._remove(full_key)
+        size = estimate_size(value) if size is None else size
+        if size > self.max_bytes:
+            logger.debug(f"Not caching {namespace}:{key}, {size} bytes exceeds the cache budget")
+            return
+
+        self._entries[full_key] = _Entry(value, now + (self.ttl if ttl is None else ttl), size)
+        self.bytes += size
+        stats = self._stats[namespace]
+        stats["entries"] += 1
+        stats["bytes"] += size
+
+        if now >= self._next_sweep:
+            self.sweep(now)
+        while len(self._entries) > self.max_entries or self.bytes > self.max_bytes:
+            self._remove(next(iter(self._entries)), "evictions")
+
+    def delete(self, key: Hashable, namespace: str = "default") -> None:
+        if (namespace, key) in self._entries:
+            self._remove((namespace, key))
+
+    def sweep(self, now: Optional[float] = None) -> int:
+        """Drop every expired entry; returns how many were removed"""
+        now = time.monotonic() if now is None else now
+        expired = [full_key for full_key, entry in self._entries.items() if entry.expires <= now]
+        for full_key in expired:
+            self._remove(full_key, "expirations")
+        self._next_sweep = now + self.sweep_seconds
+        return len(expired)
+
+    async def get_or_compute(self, key: Hashable, compute: Callable[[], Awaitable[Any]],
+                             namespace: str = "default", ttl: Optional[float] = None,
+                             cache_if: Optional[Callable[[Any], bool]] = None) -> Any:
+        """Cached value, or the result of compute() stored under the key.
+        Concurrent misses for the same key share one compute() call."""
+        value = self.get(key, namespace, _MISSING)
+        if value is not _MISSING:
+            return value
+
+        async def fill() -> Any:
+            result = await compute()
+            if cache_if is None or cache_if(result):
+                self.set(key, result, namespace, ttl)
+            return result
+
+        return await self._flights.do((namespace, key), fill)
+
+    def clear(self, namespace: Optional[str] = None) -> None:
+        """Clear all cached data, or only one namespace"""
+        for full_key in [k for k in self._entries if namespace is None or k[0] == namespace]:
+            self._remove(full_key)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "entries": len(self._entries),
+            "bytes": self.bytes,
+            "namespaces": {namespace: dict(stats) for namespace, stats in self._stats.items()}
+        }
+
+# Shared cache for search results and property details
+result_cache = PropertyCache(
+    ttl_minutes=settings.result_cache_ttl_seconds / 60,
+    max_entries=settings.result_cache_max_entries,
+    max_bytes=settings.result_cache_max_bytes,
+    sweep_seconds=settings.result_cache_sweep_seconds
+)
@@ -0,0 +1,168 @@
+import hashlib
+import json
+import logging
+from html import escape
+from typing import Any, Dict, Iterable, List, Optional, Sequence
+from app.config.settings import settings
+from .propertyRecord import PropertyRecord
+
+logger = logging.getLogger(__name__)
+
+def content_hash(record: PropertyRecord) -> str:
+    """Digest of every field a card is rendered from"""
+    row = json.dumps(record.to_row(), ensure_ascii=False, separators=(',', ':'), default=str)
+    return hashlib.blake2b(row.encode('utf-8'), digest_size=8).hexdigest()
+
+def _first_price(record: PropertyRecord):
+    return next((op for op in record.operations if op[2] is not None), None)
+
+def card_image(record: PropertyRecord) -> str:
+    """Card-sized image: a resized proxy variant when the proxy is on, else Tokko's thumb"""
+    if not record.photos:
+        return ''
+    if settings.image_proxy_enabled:
+        return f"/img/{record.id}/0?w={settings.image_card_width}"
+    return record.thumb_url or record.image_url
+
+def card_summary(record: PropertyRecord) -> Dict[str, Any]:
+    """Listing summary handed to the model as search_properties output"""
+    operation = _first_price(record)
+    return {
+        "id": record.id,
+        "title": record.title or 'Propiedad',
+        "address": record.address or 'Consultar dirección',
+        "operation_type": operation[0] if operation else 'N/D',
+        "property_type": record.type_name or 'N/D',
+        "price": f"{operation[1] or 'ARS'} {operation[2]:,.0f}" if operation else "Consultar",
+        "rooms": record.rooms,
+        "surface": f"{record.total_surface:g} m²" if record.total_surface is not None else "N/D m²",
+        "expenses": f"ARS {record.expenses:,}",
+        # Keyword matching already ran locally; a preview is enough for the model
+        "description": record.description[:200] + ("..." if len(record.description) > 200 else ""),
+        "image_url": record.image_url or None,
+        "url": record.public_url
+    }
+
+def card_html(record: PropertyRecord, summary: Dict[str, Any]) -> str:
+    """Property card for the chat UI"""
+    e = lambda value: escape(str(value), quote=True)
+    return f'''
+            <div class="property-card" data-property-id="{e(record.id)}">
+                <div class="property-image">
+                    <img src="{e(card_image(record))}" alt="{e(record.title or 'Propiedad')}" loading="lazy">
+                    <div class="property-tags">
+                        <span class="tag operation-tag">{e(summary['operation_type'])}</span>
+                        <span class="tag price-tag">{e(summary['price'])}</span>
+                    </div>
+                </div>
+                <div class="property-content">
+                    <h3 class="property-title">{e(summary['title'])}</h3>
+                    <p class="property-location">
+                        <i class="fas fa-map-marker-alt"></i>
+                        {e(summary['address'])}
+                    </p>
+                    <div class="property-details">
+                        <div class="detail-row">
+                            <span class="detail-item">
+                                <i class="fas fa-ruler-combined"></i> {e(summary['surface'])}
+                            </span>
+                            <span class="detail-item">
+                                <i class="fas fa-money-bill-wave"></i> Exp: {e(summary['expenses'])}
+                            </span>
+                        </div>
+                        <div class="detail-row">
+                            <span class="detail-item">
+                                <i class="fas fa-door-open"></i> {e(record.rooms)} Amb.
+                            </span>
+                            <span class="detail-item">
+                                <i class="fas fa-bath"></i> {e(record.bathrooms)} Baños
+                            </span>
+                        </div>
+                    </div>
+                    <p class="property-description">{e(summary['description'])}</p>
+                    <a href="{e(record.public_url or '#')}" class="property-button" target="_blank">
+                        <span>Ver más detalles</span>
+                        <i class="fas fa-external-link-alt"></i>
+                    </a>
+                </div>
+            </div>
+        '''
+
+def card_markdown(record: PropertyRecord) -> str:
+    """Markdown card body; the list number is prepended per response"""
+    operation = _first_price(record)
+    price = f"{operation[2]:,.0f}" if operation else 'Consultar'
+    surface = f"{record.total_surface:g}" if record.total_surface is not None else 'N/D'
+    text = (
+        f"**{record.title or 'Departamento'}**\n"
+        f"   - Operación: {operation[0] if operation else 'N/D'}\n"
+        f"   - Tipo: {record.type_name or 'Departamento'}\n"
+        f"   - Precio: ${price}\n"
+        f"   - Ambientes: {record.rooms}\n"
+        f"   - Superficie: {surface} m2\n"
+        f"   - Expensas: ${record.expenses:,}\n"
+        f"   - Descripción: {record.description or 'Sin descripción'}\n"
+    )
+    if record.image_url:
+        text += f"   - imagen:{record.image_url}\n"
+    if record.public_url:
+        text += f"   - [Ver más detalles]({record.public_url})\n"
+    return text
+
+class Card:
+    """Pre-rendered fragments of one listing"""
+
+    __slots__ = ('content_hash', 'summary', 'html', 'markdown')
+
+    def __init__(self, record: PropertyRecord, digest: str):
+        self.content_hash = digest
+        self.summary = card_summary(record)
+        self.html = card_html(record, self.summary)
+        self.markdown = card_markdown(record)
+
+class CardCache:
+    """Card fragments for every listing of a snapshot, rendered at sync time.
+
+    Cards are keyed by property id and content hash; cards of listings whose
+    hash did not change are carried over from the previous snapshot, so a
+    delta sync only renders the listings that changed.
+    """
+
+    def __init__(self, records: Sequence[PropertyRecord], previous: Optional['CardCache'] = None):
+        self.cards: Dict[Any, Card] = {}
+        rendered = 0
+        for record in records:
+            digest = content_hash(record)
+            card = previous.cards.get(record.id) if previous is not None else None
+            if card is None or card.content_hash != digest:
+                card = Card(record, digest)
+                rendered += 1
+            self.cards[record.id] = card
+        if previous is not None:
+            logger.info(f"Cards rendered: {rendered} of {len(self.cards)} listings")
+
+    def __len__(self) -> int:
+        return len(self.cards)
+
+    def get(self, property_id: Any) -> Optional[Card]:
+        return self.cards.get(property_id)
+
+    def _select(self, property_ids: Iterable[Any]) -> List[Card]:
+        cards = []
+        for property_id in property_ids:
+            card = self.cards.get(property_id)
+            if card is None:
+                logger.info(f"No card for property {property_id}; it left the inventory")
+                continue
+            cards.append(card)
+        return cards
+
+    def summaries(self, property_ids: Iterable[Any]) -> List[Dict[str, Any]]:
+        return [card.summary for card in self._select(property_ids)]
+
+    def grid(self, property_ids: Iterable[Any]) -> str:
+        return '<div class="properties-grid">' + ''.join(card.html for card in self._select(property_ids)) + '</div>'
+
+    def markdown(self, property_ids: Iterable[Any]) -> str:
+        return "\n\n".join(f"{position}. {card.markdown}"
+                           for position, card in enumerate(self._select(property_ids), 1))
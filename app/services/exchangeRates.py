@@ -0,0 +1,69 @@
+import time
+import logging
+from typing import Dict, Optional
+import aiohttp
+from app.config.settings import settings
+
+logger = logging.getLogger(__name__)
+
+class ExchangeRates:
+    """Exchange-rate table used to compare prices across currencies.
+
+    Rates are units of each currency per one unit of the base currency
+    (e.g. {"USD": 1, "ARS": 1000}). The table starts from the EXCHANGE_RATES
+    setting and, when EXCHANGE_RATES_URL is set, is reloaded from it every
+    exchange_rates_refresh_minutes. Every change bumps `version`, which
+    invalidates the normalized price columns built from the old rates.
+    """
+
+    def __init__(self, rates: Optional[Dict[str, float]] = None, base: Optional[str] = None):
+        self.base = (base or settings.price_base_currency).upper()
+        self.rates: Dict[str, float] = {}
+        self.version = 0
+        self.loaded_at: Optional[float] = None
+        self.update(settings.exchange_rates if rates is None else rates)
+
+    def update(self, rates: Dict[str, float]) -> bool:
+        """Replace the table; returns True when any rate changed"""
+        table = {self.base: 1.0}
+        for currency, rate in rates.items():
+            try:
+                rate = float(rate)
+            except (TypeError, ValueError):
+                continue
+            if rate > 0:
+                table[currency.upper()] = rate
+        self.loaded_at = time.monotonic()
+        if table == self.rates:
+            return False
+        self.rates = table
+        self.version += 1
+        logger.info(f"Exchange rates v{self.version} (per 1 {self.base}): {table}")
+        return True
+
+    def rate(self, currency: Optional[str]) -> Optional[float]:
+        return self.rates.get((currency or '').upper())
+
+    def to_base(self, amount: Optional[float], currency: Optional[str]) -> Optional[float]:
+        """Amount expressed in the base currency; None for unknown currencies"""
+        rate = self.rate(currency)
+        if amount is None or rate is None:
+            return None
+        return amount / rate
+
+    def is_due(self) -> bool:
+        if not settings.exchange_rates_url:
+            return False
+        return time.monotonic() - self.loaded_at >= settings.exchange_rates_refresh_minutes * 60
+
+    async def reload(self, session: aiohttp.ClientSession) -> bool:
+        """Fetch the table from EXCHANGE_RATES_URL ({"rates": {...}} or a flat mapping)"""
+        async with session.get(settings.exchange_rates_url) as response:
+            if response.status != 200:
+                raise RuntimeError(f"Exchange rate source returned {response.status}")
+            payload = await response.json(content_type=None)
+        rates = payload.get('rates', payload) if isinstance(payload, dict) else {}
+        return self.update({**settings.exchange_rates, **rates})
+
+# Process-wide table shared by every snapshot's price columns
+exchange_rates = ExchangeRates()
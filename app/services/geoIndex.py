@@ -0,0 +1,113 @@
+import heapq
+import math
+from collections import defaultdict
+from typing import Dict, List, Optional, Sequence, Tuple
+from .propertyRecord import PropertyRecord
+
+EARTH_RADIUS_KM = 6371.0
+
+def haversine_km(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
+    phi1, phi2 = math.radians(lat1), math.radians(lat2)
+    dphi = phi2 - phi1
+    dlambda = math.radians(lon2 - lon1)
+    a = math.sin(dphi / 2) ** 2 + math.cos(phi1) * math.cos(phi2) * math.sin(dlambda / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * math.asin(math.sqrt(a))
+
+def parse_point(value: str) -> Optional[Tuple[float, float]]:
+    """'-34.54,-58.55' -> (lat, long); None if the text is not a coordinate pair"""
+    parts = value.replace(';', ',').split(',')
+    if len(parts) != 2:
+        return None
+    try:
+        lat, lon = float(parts[0]), float(parts[1])
+    except ValueError:
+        return None
+    if -90 <= lat <= 90 and -180 <= lon <= 180:
+        return lat, lon
+    return None
+
+class GeoIndex:
+    """Uniform grid over equirectangular-projected listing coordinates.
+
+    Answers radius, bounding-box and k-nearest queries by visiting only the
+    grid cells that can contain a hit (or only the occupied cells, when the
+    query box spans more cells than that); listings without coordinates (or
+    with Tokko's 0,0 placeholder) are not indexed. Radius queries are capped
+    at max_radius_km.
+    """
+
+    def __init__(self, records: Sequence[PropertyRecord], cell_km: float = 0.5, max_radius_km: float = 50.0):
+        self.cell_km = cell_km
+        self.max_radius_km = max_radius_km
+        self.points: Dict[int, Tuple[float, float]] = {}
+        for position, record in enumerate(records):
+            if record.geo_lat is None or record.geo_long is None or (not record.geo_lat and not record.geo_long):
+                continue
+            self.points[position] = (record.geo_lat, record.geo_long)
+
+        latitudes = [lat for lat, _ in self.points.values()]
+        self.reference_lat = sum(latitudes) / len(latitudes) if latitudes else 0.0
+        self._kx = math.radians(1) * EARTH_RADIUS_KM * math.cos(math.radians(self.reference_lat))
+        self._ky = math.radians(1) * EARTH_RADIUS_KM
+
+        self.cells: Dict[Tuple[int, int], List[int]] = defaultdict(list)
+        for position, (lat, lon) in self.points.items():
+            self.cells[self._cell(lat, lon)].append(position)
+
+    def __len__(self) -> int:
+        return len(self.points)
+
+    def _cell(self, lat: float, lon: float) -> Tuple[int, int]:
+        return int(math.floor(lon * self._kx / self.cell_km)), int(math.floor(lat * self._ky / self.cell_km))
+
+    def _cells_in(self, min_lat: float, min_lon: float, max_lat: float, max_lon: float):
+        x0, y0 = self._cell(min_lat, min_lon)
+        x1, y1 = self._cell(max_lat, max_lon)
+        if (x1 - x0 + 1) * (y1 - y0 + 1) > len(self.cells):
+            # Wide box: scanning the populated cells is cheaper than walking the grid
+            for (x, y), cell in self.cells.items():
+                if x0 <= x <= x1 and y0 <= y <= y1:
+                    yield cell
+            return
+        for x in range(x0, x1 + 1):
+            for y in range(y0, y1 + 1):
+                cell = self.cells.get((x, y))
+                if cell:
+                    yield cell
+
+    def bbox(self, min_lat: float, min_lon: float, max_lat: float, max_lon: float) -> List[int]:
+        """Positions inside the bounding box"""
+        return [position for cell in self._cells_in(min_lat, min_lon, max_lat, max_lon) for position in cell
+                if min_lat <= self.points[position][0] <= max_lat and min_lon <= self.points[position][1] <= max_lon]
+
+    def radius(self, lat: float, lon: float, radius_km: float) -> Dict[int, float]:
+        """Positions within radius_km (at most max_radius_km) of the point, with their distance in km"""
+        return self._within(lat, lon, min(radius_km, self.max_radius_km))
+
+    def _within(self, lat: float, lon: float, radius_km: float) -> Dict[int, float]:
+        dlat = radius_km / self._ky
+        dlon = radius_km / self._kx if self._kx else 180.0
+        hits = {}
+        for cell in self._cells_in(lat - dlat, lon - dlon, lat + dlat, lon + dlon):
+            for position in cell:
+                distance = haversine_km(lat, lon, *self.points[position])
+                if distance <= radius_km:
+                    hits[position] = distance
+        return hits
+
+    def nearest(self, lat: float, lon: float, k: int = 10) -> List[Tuple[int, float]]:
+        """k nearest positions as (position, km), widening the search ring until k are found"""
+        if not self.points:
+            return []
+        radius_km = self.cell_km
+        while True:
+            hits = self._within(lat, lon, radius_km)
+            if len(hits) >= k or len(hits) == len(self.points) or radius_km > 2 * EARTH_RADIUS_KM:
+                return heapq.nsmallest(k, hits.items(), key=lambda item: item[1])
+            radius_km *= 2
+
+    def centroid(self, positions) -> Optional[Tuple[float, float]]:
+        points = [self.points[position] for position in positions if position in self.points]
+        if not points:
+            return None
+        return sum(lat for lat, _ in points) / len(points), sum(lon for _, lon in points) / len(points)
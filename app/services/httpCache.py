@@ -0,0 +1,112 @@
+import gzip
+import hashlib
+import logging
+import mimetypes
+import os
+from typing import Dict, Optional, Tuple
+from fastapi.responses import Response
+from fastapi.staticfiles import StaticFiles
+from starlette.datastructures import Headers
+from app.config.settings import settings
+
+try:
+    import brotli
+except ImportError:  # brotli is optional; gzip is always available
+    brotli = None
+
+logger = logging.getLogger(__name__)
+
+# Bodies smaller than this are not worth a compressed variant
+MIN_COMPRESS_BYTES = 512
+COMPRESSIBLE_TYPES = ('text/', 'application/json', 'application/javascript', 'image/svg+xml')
+
+class CachedBody:
+    """One response body with its content-hash ETag and lazily built,
+    then reused, gzip/brotli variants"""
+
+    __slots__ = ('body', 'media_type', 'digest', '_encoded')
+
+    def __init__(self, body: bytes, media_type: str):
+        self.body = body
+        self.media_type = media_type
+        self.digest = hashlib.sha1(body).hexdigest()[:20]
+        self._encoded: Dict[str, bytes] = {}
+
+    def etag(self, encoding: Optional[str] = None) -> str:
+        return f'"{self.digest}-{encoding}"' if encoding else f'"{self.digest}"'
+
+    def compressible(self) -> bool:
+        return len(self.body) >= MIN_COMPRESS_BYTES and self.media_type.startswith(COMPRESSIBLE_TYPES)
+
+    def encoded(self, encoding: str) -> bytes:
+        data = self._encoded.get(encoding)
+        if data is None:
+            if encoding == 'br':
+                data = brotli.compress(self.body, quality=5)
+            else:
+                data = gzip.compress(self.body, compresslevel=6, mtime=0)
+            self._encoded[encoding] = data
+        return data
+
+def negotiate_encoding(headers: Headers) -> Optional[str]:
+    accepted = {part.split(';')[0].strip().lower() for part in headers.get('accept-encoding', '').split(',')}
+    if brotli is not None and 'br' in accepted:
+        return 'br'
+    if 'gzip' in accepted:
+        return 'gzip'
+    return None
+
+def is_not_modified(headers: Headers, cached: CachedBody) -> bool:
+    """True when If-None-Match names any encoding variant of this body"""
+    if_none_match = headers.get('if-none-match')
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == '*':
+        return True
+    tags = {tag.strip().removeprefix('W/').strip('"') for tag in if_none_match.split(',')}
+    return any(tag.split('-')[0] == cached.digest for tag in tags)
+
+def cached_response(headers: Headers, cached: CachedBody, cache_control: str, status_code: int = 200) -> Response:
+    """304 when the client already has the body, otherwise the best encoded variant"""
+    encoding = negotiate_encoding(headers) if cached.compressible() else None
+    response_headers = {
+        'ETag': cached.etag(encoding),
+        'Cache-Control': cache_control,
+        'Vary': 'Accept-Encoding'
+    }
+    if status_code == 200 and is_not_modified(headers, cached):
+        return Response(status_code=304, headers=response_headers)
+    if encoding:
+        response_headers['Content-Encoding'] = encoding
+        return Response(cached.encoded(encoding), status_code=status_code,
+                        media_type=cached.media_type, headers=response_headers)
+    return Response(cached.body, status_code=status_code, media_type=cached.media_type, headers=response_headers)
+
+def api_cache_control() -> str:
+    return f"public, max-age={settings.api_cache_seconds}, must-revalidate"
+
+class CachedStaticFiles(StaticFiles):
+    """StaticFiles with content-hash ETags, Cache-Control and precompressed
+    bodies; each file is read and compressed once per (mtime, size)"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._bodies: Dict[str, Tuple[Tuple[float, int], CachedBody]] = {}
+
+    def file_response(self, full_path, stat_result: os.stat_result, scope, status_code: int = 200) -> Response:
+        if stat_result.st_size > settings.static_cache_max_file_bytes:
+            return super().file_response(full_path, stat_result, scope, status_code)
+
+        version = (stat_result.st_mtime, stat_result.st_size)
+        entry = self._bodies.get(full_path)
+        if entry is None or entry[0] != version:
+            with open(full_path, 'rb') as f:
+                body = f.read()
+            media_type = mimetypes.guess_type(str(full_path))[0] or 'application/octet-stream'
+            if media_type.startswith('text/') or media_type == 'application/javascript':
+                media_type = f"{media_type}; charset=utf-8"
+            entry = (version, CachedBody(body, media_type))
+            self._bodies[full_path] = entry
+
+        return cached_response(Headers(scope=scope), entry[1],
+                               f"public, max-age={settings.static_cache_seconds}", status_code)
@@ -0,0 +1,185 @@
+import asyncio
+import hashlib
+import io
+import logging
+import os
+import threading
+from collections import OrderedDict
+from typing import Awaitable, Callable, Optional, Tuple
+from app.config.settings import settings
+from .propertyRecord import PropertyRecord
+from .singleFlight import SingleFlight
+
+try:
+    from PIL import Image
+except ImportError:  # Pillow is optional; without it variants are the closest Tokko size
+    Image = None
+
+logger = logging.getLogger(__name__)
+
+# Origin fetcher: URL -> (body, content type). Swappable so the proxy can run against a local stub.
+OriginFetcher = Callable[[str], Awaitable[Tuple[bytes, str]]]
+
+class ImageNotFound(Exception):
+    """Raised when a listing or photo index does not exist"""
+    pass
+
+def http_origin_fetcher(get_session) -> OriginFetcher:
+    """Fetcher that downloads through an aiohttp session returned by get_session()"""
+    async def fetch(url: str) -> Tuple[bytes, str]:
+        session = await get_session()
+        async with session.get(url) as response:
+            if response.status != 200:
+                raise RuntimeError(f"Image origin returned {response.status} for {url}")
+            return await response.read(), response.headers.get('Content-Type', 'image/jpeg')
+    return fetch
+
+class DiskLRUCache:
+    """Byte-budgeted LRU cache of files in one directory.
+
+    File names are digests of the cache key; recency is tracked in memory
+    and seeded from file mtimes on startup, so the cache survives restarts.
+    Writes go through a temp file and an atomic rename. Bookkeeping is
+    locked, since reads and writes run in worker threads.
+    """
+
+    def __init__(self, directory: str, max_bytes: int):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.bytes = 0
+        self._files: "OrderedDict[str, int]" = OrderedDict()
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+
+        entries = []
+        for name in os.listdir(directory):
+            path = os.path.join(directory, name)
+            if name.endswith('.tmp') or not os.path.isfile(path):
+                continue
+            stat = os.stat(path)
+            entries.append((stat.st_mtime, name, stat.st_size))
+        for _, name, size in sorted(entries):
+            self._files[name] = size
+            self.bytes += size
+        self._evict()
+
+    @staticmethod
+    def _name(key: str) -> str:
+        return hashlib.sha1(key.encode('utf-8')).hexdigest()
+
+    def _path(self, name: str) -> str:
+        return os.path.join(self.directory, name)
+
+    def get(self, key: str) -> Optional[bytes]:
+        name = self._name(key)
+        with self._lock:
+            if name not in self._files:
+                return None
+        try:
+            with open(self._path(name), 'rb') as f:
+                data = f.read()
+            os.utime(self._path(name))
+        except OSError:
+            with self._lock:
+                self.bytes -= self._files.pop(name, 0)
+            return None
+        with self._lock:
+            if name in self._files:
+                self._files.move_to_end(name)
+        return data
+
+    def set(self, key: str, data: bytes) -> None:
+        name = self._name(key)
+        tmp_path = f"{self._path(name)}.{threading.get_ident()}.tmp"
+        with open(tmp_path, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, self._path(name))
+        with self._lock:
+            self.bytes += len(data) - self._files.pop(name, 0)
+            self._files[name] = len(data)
+            self._evict()
+
+    def _evict(self) -> None:
+        while self.bytes > self.max_bytes and self._files:
+            name, size = self._files.popitem(last=False)
+            self.bytes -= size
+            try:
+                os.remove(self._path(name))
+            except OSError:
+                pass
+
+class ImageProxy:
+    """Serves listing photos at a few fixed widths from a local disk cache.
+
+    The smallest Tokko rendition that covers the requested width is fetched
+    (thumb, web image, then original) and, when Pillow is installed, resized
+    to that width. Concurrent misses for the same variant share one fetch.
+    """
+
+    def __init__(self, lookup: Callable[[int], Optional[PropertyRecord]], fetcher: OriginFetcher,
+                 cache: DiskLRUCache):
+        self.lookup = lookup
+        self.fetcher = fetcher
+        self.cache = cache
+        self._flights = SingleFlight("images")
+
+    @staticmethod
+    def snap_width(width: Optional[int]) -> Optional[int]:
+        """Round a requested width up to a configured variant (None: largest web image)"""
+        if not width:
+            return None
+        for candidate in sorted(settings.image_widths):
+            if width <= candidate:
+                return candidate
+        return None
+
+    def source(self, photo: Tuple, width: Optional[int]) -> str:
+        image, thumb, original, photo_width, _ = photo
+        if width is not None and (width <= settings.image_thumb_width or Image is None):
+            # Without Pillow nothing is resized, so the thumb is the closest small rendition
+            return thumb
+        if width is not None and photo_width and width > photo_width:
+            return original
+        return image
+
+    async def get(self, property_id: int, n: int, width: Optional[int] = None) -> Tuple[bytes, str]:
+        """(body, content type) of photo n of a listing at the given width"""
+        record = self.lookup(property_id)
+        if record is None or not 0 <= n < len(record.photos):
+            raise ImageNotFound(f"No photo {n} for property {property_id}")
+        width = self.snap_width(width)
+        url = self.source(record.photos[n], width)
+        key = f"{url}|{width or 'web'}"
+
+        cached = await asyncio.to_thread(self.cache.get, key)
+        if cached is not None:
+            return cached, self._content_type(cached)
+        return await self._flights.do(key, lambda: self._fill(key, url, width))
+
+    async def _fill(self, key: str, url: str, width: Optional[int]) -> Tuple[bytes, str]:
+        body, content_type = await self.fetcher(url)
+        if width is not None and Image is not None:
+            body = await asyncio.to_thread(self._resize, body, width)
+        await asyncio.to_thread(self.cache.set, key, body)
+        return body, self._content_type(body, content_type)
+
+    @staticmethod
+    def _resize(body: bytes, width: int) -> bytes:
+        with Image.open(io.BytesIO(body)) as image:
+            if image.width <= width:
+                return body
+            height = round(image.height * width / image.width)
+            resized = image.convert('RGB').resize((width, height), Image.LANCZOS)
+            output = io.BytesIO()
+            resized.save(output, format='JPEG', quality=80, optimize=True, progressive=True)
+            return output.getvalue()
+
+    @staticmethod
+    def _content_type(body: bytes, fallback: str = 'image/jpeg') -> str:
+        if body.startswith(b'\x89PNG'):
+            return 'image/png'
+        if body[:4] == b'RIFF' and body[8:12] == b'WEBP':
+            return 'image/webp'
+        if body.startswith(b'\xff\xd8'):
+            return 'image/jpeg'
+        return fallback
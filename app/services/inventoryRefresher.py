@@ -0,0 +1,124 @@
+import asyncio
+import logging
+import random
+import time
+from typing import Optional
+from app.config.settings import settings
+from .exchangeRates import exchange_rates
+from .tokkoMetadata import metadata_store
+
+logger = logging.getLogger(__name__)
+
+class InventoryRefresher:
+    """Background task that keeps the shared inventory snapshot fresh.
+
+    Searches never wait on it: they read whatever snapshot is current, and
+    if Tokko is unreachable the last good snapshot keeps being served.
+    """
+
+    def __init__(self, tokko_client, interval: Optional[float] = None, jitter: Optional[float] = None):
+        self.tokko_client = tokko_client
+        self.interval = interval or settings.inventory_delta_sync_seconds
+        self.jitter = settings.inventory_refresh_jitter if jitter is None else jitter
+        self.consecutive_failures = 0
+        self.last_error: Optional[str] = None
+        self.persisted_version: Optional[int] = None
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def cache(self):
+        return self.tokko_client.cache
+
+    def is_running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    async def start(self) -> None:
+        """Restore the persisted snapshot, then start the refresh loop (the first sync runs immediately)"""
+        if self.is_running():
+            return
+        metadata_store.restore()
+        if settings.inventory_snapshot_path and self.cache.restore(settings.inventory_snapshot_path):
+            self.persisted_version = self.cache.version
+        self._task = asyncio.create_task(self._run(), name="inventory-refresher")
+        logger.info(f"Inventory refresher started (interval={self.interval}s, jitter={self.jitter:.0%})")
+
+    async def stop(self) -> None:
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+        logger.info("Inventory refresher stopped")
+
+    async def refresh_once(self) -> bool:
+        """Run one sync; on failure keep the current snapshot and report it"""
+        try:
+            await self.tokko_client.sync_inventory()
+            self.consecutive_failures = 0
+            self.last_error = None
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            self.consecutive_failures += 1
+            self.last_error = str(e)
+            age = self.cache.snapshot_age()
+            logger.warning(f"Inventory refresh failed ({self.consecutive_failures} in a row), "
+                           f"serving stale snapshot (age {'n/a' if age is None else f'{age:.0f}s'}): {str(e)}")
+            return False
+
+        await self.reload_rates()
+        await metadata_store.refresh_if_due(self.tokko_client.transport)
+        await self.persist()
+        return True
+
+    async def reload_rates(self) -> None:
+        """Reload the exchange-rate table when it is due; keep the old one on failure"""
+        if not exchange_rates.is_due():
+            return
+        try:
+            await exchange_rates.reload(await self.tokko_client.transport.get_session())
+        except Exception as e:
+            exchange_rates.loaded_at = time.monotonic()
+            logger.warning(f"Exchange rate reload failed, keeping v{exchange_rates.version}: {str(e)}")
+
+    async def persist(self) -> None:
+        """Write the snapshot to disk when its version changed since the last write"""
+        path = settings.inventory_snapshot_path
+        if not path or self.cache.version == self.persisted_version or not self.cache.is_loaded():
+            return
+        try:
+            size = await asyncio.to_thread(self.cache.persist, path)
+            self.persisted_version = self.cache.version
+            logger.info(f"Persisted inventory snapshot v{self.cache.version} to {path} ({size} bytes)")
+        except Exception as e:
+            logger.warning(f"Failed to persist inventory snapshot: {str(e)}")
+
+    def next_delay(self) -> float:
+        """Interval with +/- jitter so instances don't hit Tokko in lockstep"""
+        spread = self.interval * self.jitter
+        return max(1.0, self.interval + random.uniform(-spread, spread))
+
+    def warn_if_stale(self) -> None:
+        age = self.cache.snapshot_age()
+        if age is not None and age > settings.inventory_stale_warning_seconds:
+            logger.warning(f"Serving stale inventory snapshot v{self.cache.version} (age {age:.0f}s, "
+                           f"last error: {self.last_error})")
+
+    def status(self) -> dict:
+        age = self.cache.snapshot_age()
+        return {
+            "running": self.is_running(),
+            "version": self.cache.version,
+            "listings": len(self.cache.properties),
+            "age_seconds": None if age is None else round(age, 1),
+            "consecutive_failures": self.consecutive_failures,
+            "last_error": self.last_error
+        }
+
+    async def _run(self) -> None:
+        while True:
+            await self.refresh_once()
+            await asyncio.sleep(self.next_delay())
@@ -0,0 +1,98 @@
+import asyncio
+import logging
+import math
+from typing import Any, Dict, List, Optional
+from app.config.settings import settings
+from .propertyRecord import change_marker
+
+logger = logging.getLogger(__name__)
+
+class InventorySync:
+    """Full-inventory sync engine for Tokko's paginated /property/ endpoint.
+
+    Reads the first page, derives the page count from meta.total_count and
+    fetches the remaining offsets concurrently with a bounded fan-out.
+    """
+
+    def __init__(self, client, page_size: Optional[int] = None, concurrency: Optional[int] = None):
+        self.client = client
+        self.page_size = max(1, page_size or settings.tokko_page_size)
+        self.concurrency = max(1, concurrency or settings.tokko_sync_concurrency)
+
+    async def fetch_all(self, params: Optional[Dict[str, Any]] = None) -> List[Dict]:
+        """Fetch every page for the given query and merge them into one inventory"""
+        first = await self.client.fetch_page(offset=0, limit=self.page_size, params=params)
+        meta = first.get('meta', {})
+        total = meta.get('total_count') or 0
+        pages = [first.get('objects', [])]
+
+        offsets = list(range(self.page_size, total, self.page_size))
+        logger.info(f"Inventory sync: {total} listings in {math.ceil(total / self.page_size) if total else 1} pages "
+                    f"(page_size={self.page_size}, concurrency={self.concurrency})")
+
+        if offsets:
+            semaphore = asyncio.Semaphore(self.concurrency)
+
+            async def fetch(offset: int) -> List[Dict]:
+                async with semaphore:
+                    data = await self.client.fetch_page(offset=offset, limit=self.page_size, params=params)
+                    return data.get('objects', [])
+
+            # gather keeps offset order; any failed page fails the whole sync
+            pages.extend(await asyncio.gather(*(fetch(offset) for offset in offsets)))
+
+        return self.merge_pages(pages, total)
+
+    @staticmethod
+    def merge_pages(pages: List[List[Dict]], total: int = 0) -> List[Dict]:
+        """Merge pages in offset order, dropping listings repeated across page boundaries"""
+        seen = set()
+        merged = []
+        for page in pages:
+            for prop in page:
+                prop_id = prop.get('id')
+                if prop_id in seen:
+                    continue
+                seen.add(prop_id)
+                merged.append(prop)
+
+        if total and len(merged) < total:
+            logger.warning(f"Inventory sync returned {len(merged)} of {total} listings "
+                           "(inventory changed while paging)")
+        return merged
+
+    async def fetch_changes(self, since: str, params: Optional[Dict[str, Any]] = None) -> Optional[Dict[str, Any]]:
+        """Fetch listings changed after the `since` high-water mark.
+
+        Pages are requested newest-change-first and paging stops at the first
+        listing at or below the mark. Returns None when the upstream ordering
+        cannot be trusted, in which case the caller should run a full sync.
+        """
+        query = {**(params or {}), "order_by": settings.tokko_delta_order_by}
+        changed = []
+        total = 0
+        offset = 0
+
+        while True:
+            data = await self.client.fetch_page(offset=offset, limit=self.page_size, params=query)
+            total = data.get('meta', {}).get('total_count') or 0
+            objects = data.get('objects', [])
+            markers = [change_marker(prop) for prop in objects]
+
+            if markers != sorted(markers, reverse=True):
+                logger.warning("Delta sync: Tokko ignored the change ordering, full sync required")
+                return None
+
+            reached_mark = False
+            for prop, marker in zip(objects, markers):
+                if marker <= since:
+                    reached_mark = True
+                    break
+                changed.append(prop)
+
+            offset += self.page_size
+            if reached_mark or not objects or offset >= total:
+                break
+
+        logger.info(f"Delta sync: {len(changed)} listings changed since {since}")
+        return {"changed": changed, "total": total}
@@ -0,0 +1,108 @@
+import logging
+from collections import defaultdict
+from typing import Dict, Iterable, List, Set, Tuple
+from app.config.settings import settings
+from .textNormalize import fold, trigrams
+
+logger = logging.getLogger(__name__)
+
+# Colloquial names users type -> Tokko location names. Extend or override
+# with the LOCATION_ALIASES setting (JSON object of alias -> [names]).
+DEFAULT_LOCATION_ALIASES: Dict[str, List[str]] = {
+    "ballester": ["Villa Ballester"],
+    "villa ballester": ["Villa Ballester"],
+    "malaver": ["Malaver"],
+    "villa malaver": ["Malaver"],
+    "chilavert": ["Chilavert"],
+    "suarez": ["Jose León Suarez"],
+    "jose leon suarez": ["Jose León Suarez"],
+    "jls": ["Jose León Suarez"],
+    "san martin": ["San Martin", "S.Martin(Ctro)"],
+    "san martin centro": ["S.Martin(Ctro)"],
+    "gral san martin": ["General San Martin"],
+    "loma hermosa": ["Loma Hermosa"],
+    "san andres": ["San Andrés"],
+}
+
+class LocationIndex:
+    """Resolves free-text location queries to Tokko location ids.
+
+    Keys are accent-folded location names plus the alias table. A query is
+    resolved by exact key, then by whole-word containment, and finally by a
+    ranked character-trigram match for misspellings.
+    """
+
+    def __init__(self, locations: Iterable[Tuple[int, str]], aliases: Dict[str, List[str]] = None):
+        self.ids_by_key: Dict[str, Set[int]] = defaultdict(set)
+        self.names: Dict[int, str] = {}
+
+        for location_id, name in locations:
+            if location_id is None or not name:
+                continue
+            self.names[location_id] = name
+            self.ids_by_key[fold(name)].add(location_id)
+
+        for alias, targets in (aliases if aliases is not None else self.configured_aliases()).items():
+            for target in targets:
+                ids = self.ids_by_key.get(fold(target))
+                if ids:
+                    self.ids_by_key[fold(alias)].update(ids)
+
+        self.keys_by_token: Dict[str, Set[str]] = defaultdict(set)
+        self.keys_by_trigram: Dict[str, Set[str]] = defaultdict(set)
+        self._trigrams: Dict[str, Set[str]] = {}
+        for key in self.ids_by_key:
+            for token in key.split():
+                self.keys_by_token[token].add(key)
+            grams = trigrams(key)
+            self._trigrams[key] = grams
+            for gram in grams:
+                self.keys_by_trigram[gram].add(key)
+
+    @staticmethod
+    def configured_aliases() -> Dict[str, List[str]]:
+        aliases = dict(DEFAULT_LOCATION_ALIASES)
+        for alias, targets in settings.location_aliases.items():
+            aliases[alias] = [targets] if isinstance(targets, str) else list(targets)
+        return aliases
+
+    def fuzzy(self, query: str, limit: int = 5) -> List[Tuple[str, float]]:
+        """Keys ranked by trigram Dice similarity to the query"""
+        grams = trigrams(query)
+        if not grams:
+            return []
+        shared: Dict[str, int] = defaultdict(int)
+        for gram in grams:
+            for key in self.keys_by_trigram.get(gram, ()):
+                shared[key] += 1
+        scored = [(key, 2.0 * count / (len(grams) + len(self._trigrams[key]))) for key, count in shared.items()]
+        scored.sort(key=lambda item: item[1], reverse=True)
+        return scored[:limit]
+
+    def resolve(self, query: str) -> Set[int]:
+        """Location ids for a query; empty when nothing is close enough"""
+        folded = fold(query)
+        if not folded:
+            return set()
+
+        ids = set(self.ids_by_key.get(folded, ()))
+
+        # Keys containing the query as whole words ("martin" -> "general san martin")
+        words = folded.split()
+        candidates = set.intersection(*(self.keys_by_token.get(word, set()) for word in words))
+        padded = f" {folded} "
+        for key in candidates:
+            if padded in f" {key} ":
+                ids.update(self.ids_by_key[key])
+        if ids:
+            return ids
+
+        matches = [(key, score) for key, score in self.fuzzy(folded) if score >= settings.location_fuzzy_threshold]
+        if matches:
+            best = matches[0][1]
+            logger.info(f"Fuzzy location match for '{query}': {matches[0][0]} ({best:.2f})")
+            # Keep near-ties so an ambiguous typo does not silently pick one zone
+            for key, score in matches:
+                if score >= best - 0.05:
+                    ids.update(self.ids_by_key[key])
+        return ids
@@ -0,0 +1,182 @@
+import logging
+from datetime import datetime
+from typing import Dict, Optional, Sequence, Tuple
+import numpy as np
+from app.config.settings import settings
+from .propertyRecord import PropertyRecord
+from .exchangeRates import exchange_rates
+
+logger = logging.getLogger(__name__)
+
+def _float_column(values) -> np.ndarray:
+    return np.array([np.nan if value is None else value for value in values], dtype=np.float64)
+
+def _timestamp(value: str) -> float:
+    try:
+        return datetime.fromisoformat(value).timestamp()
+    except (TypeError, ValueError):
+        return np.nan
+
+# Sort keys accepted by PropertyColumns.order; prefix with '-' for descending
+SORT_FIELDS = ('price', 'surface', 'rooms', 'recency')
+
+class PropertyColumns:
+    """Columnar NumPy view of one inventory snapshot.
+
+    Numeric search predicates and ranking scores are evaluated as vectorized
+    operations over candidate positions instead of per-record Python
+    branches. Missing values are NaN, which never satisfies a bound.
+
+    Prices are kept per (operation, currency) in their native currency and,
+    derived from those with the current exchange rates, per operation in the
+    base currency so budgets compare across currencies.
+    """
+
+    def __init__(self, records: Sequence[PropertyRecord]):
+        self.size = len(records)
+        self.rooms = np.array([record.rooms for record in records], dtype=np.int32)
+        self.bathrooms = np.array([record.bathrooms for record in records], dtype=np.int32)
+        self.total_surface = _float_column(record.total_surface for record in records)
+        self.roofed_surface = _float_column(record.roofed_surface for record in records)
+        self.expenses = np.array([record.expenses for record in records], dtype=np.float64)
+        self.age = _float_column(record.age for record in records)
+        self.geo_lat = _float_column(record.geo_lat for record in records)
+        self.geo_long = _float_column(record.geo_long for record in records)
+        self.changed = np.array([_timestamp(record.change_marker) for record in records], dtype=np.float64)
+
+        # One price column per (operation, currency); NaN where the listing has no such price
+        self.prices: Dict[Tuple[str, str], np.ndarray] = {}
+        for position, record in enumerate(records):
+            for op_type, currency, price in record.operations:
+                if price is None:
+                    continue
+                key = (op_type.lower(), currency)
+                if key not in self.prices:
+                    self.prices[key] = np.full(self.size, np.nan)
+                self.prices[key][position] = price
+        self._normalized: Dict[Optional[str], Tuple[int, np.ndarray]] = {}
+
+    def price_column(self, operation_type: Optional[str], currency: str) -> Optional[np.ndarray]:
+        if not operation_type:
+            return None
+        return self.prices.get((operation_type.lower(), currency))
+
+    def normalized_prices(self, operation_type: Optional[str] = None) -> np.ndarray:
+        """Base-currency price per listing for one operation (any operation: the
+        lowest); NaN when unpriced or in a currency without a rate"""
+        key = operation_type.lower() if operation_type else None
+        cached = self._normalized.get(key)
+        if cached is not None and cached[0] == exchange_rates.version:
+            return cached[1]
+        column = np.full(self.size, np.nan)
+        for (op_type, currency), prices in self.prices.items():
+            if key is not None and op_type != key:
+                continue
+            rate = exchange_rates.rate(currency)
+            if rate is None:
+                logger.warning(f"No exchange rate for {currency or 'unknown currency'}, "
+                               f"{int(np.isfinite(prices).sum())} {op_type} prices left out of budget filters")
+                continue
+            column = np.fmin(column, prices / rate)
+        self._normalized[key] = (exchange_rates.version, column)
+        return column
+
+    @staticmethod
+    def budget(search_params: Dict) -> Tuple[Optional[float], Optional[float]]:
+        """(min, max) price of the search in the base currency"""
+        currency = search_params.get('currency') or settings.price_default_currency
+        if exchange_rates.rate(currency) is None:
+            logger.warning(f"No exchange rate for {currency}, ignoring the price range")
+            return None, None
+        return (exchange_rates.to_base(search_params.get('min_price') or None, currency),
+                exchange_rates.to_base(search_params.get('max_price') or None, currency))
+
+    def filter(self, positions: np.ndarray, search_params: Dict) -> np.ndarray:
+        """Keep the candidate positions that satisfy every numeric predicate"""
+        if not len(positions):
+            return positions
+        mask = np.ones(len(positions), dtype=bool)
+
+        def bound(column: np.ndarray, low=None, high=None):
+            nonlocal mask
+            values = column[positions]
+            if low is not None:
+                mask &= values >= low
+            if high is not None:
+                mask &= values <= high
+
+        if search_params.get('min_rooms') or search_params.get('max_rooms'):
+            bound(self.rooms, search_params.get('min_rooms'), search_params.get('max_rooms'))
+        if search_params.get('min_bathrooms'):
+            bound(self.bathrooms, search_params['min_bathrooms'])
+        if search_params.get('min_surface') or search_params.get('max_surface'):
+            bound(self.total_surface, search_params.get('min_surface'), search_params.get('max_surface'))
+        if search_params.get('max_expenses'):
+            bound(self.expenses, high=search_params['max_expenses'])
+        if search_params.get('max_age'):
+            bound(self.age, high=search_params['max_age'])
+
+        # Budgets compare in the base currency; unpriced listings ("Consultar") are kept
+        if search_params.get('max_price') or search_params.get('min_price'):
+            low, high = self.budget(search_params)
+            values = self.normalized_prices(search_params.get('operation_type'))[positions]
+            if high is not None:
+                mask &= ~(values > high)
+            if low is not None:
+                mask &= ~(values < low)
+
+        return positions[mask]
+
+    def score(self, positions: np.ndarray, search_params: Dict) -> np.ndarray:
+        """Relevance score per candidate: budget fit, room fit, size and recency"""
+        scores = np.zeros(len(positions), dtype=np.float64)
+        if not len(positions):
+            return scores
+
+        high = self.budget(search_params)[1] if search_params.get('max_price') else None
+        if high:
+            # Listings that use most of the budget (without exceeding it) fit best
+            fit = self.normalized_prices(search_params.get('operation_type'))[positions] / high
+            scores += 0.4 * np.nan_to_num(np.clip(fit, 0.0, 1.0), nan=0.5)
+
+        if search_params.get('min_rooms'):
+            extra = self.rooms[positions] - search_params['min_rooms']
+            scores += 0.3 * np.where(extra == 0, 1.0, np.where(extra > 0, 0.5, 0.0))
+
+        surface = self.total_surface[positions]
+        if np.isfinite(surface).any():
+            scores += 0.2 * np.nan_to_num(surface / np.nanmax(surface), nan=0.0)
+
+        changed = self.changed[positions]
+        if np.isfinite(changed).any():
+            span = np.nanmax(changed) - np.nanmin(changed)
+            if span > 0:
+                scores += 0.1 * np.nan_to_num((changed - np.nanmin(changed)) / span, nan=0.0)
+
+        return scores
+
+    def rank(self, positions: np.ndarray, search_params: Dict) -> np.ndarray:
+        """Candidates ordered by descending score (ties keep snapshot order)"""
+        if len(positions) < 2:
+            return positions
+        order = np.argsort(-self.score(positions, search_params), kind='stable')
+        return positions[order]
+
+    def order(self, positions: np.ndarray, sort: str, search_params: Dict) -> np.ndarray:
+        """Candidates ordered by one column ('price', '-surface', ...); missing values last"""
+        field = sort.lstrip('+-')
+        if field not in SORT_FIELDS:
+            raise ValueError(f"Unknown sort field '{field}', expected one of {', '.join(SORT_FIELDS)}")
+        if len(positions) < 2:
+            return positions
+        column = {
+            'price': lambda: self.normalized_prices(search_params.get('operation_type')),
+            'surface': lambda: self.total_surface,
+            'rooms': lambda: self.rooms,
+            'recency': lambda: self.changed,
+        }[field]()
+        values = column[positions].astype(np.float64)
+        if sort.startswith('-'):
+            values = -values
+        # lexsort is stable and uses the last key as the primary one
+        return positions[np.lexsort((values, np.isnan(values)))]
@@ -0,0 +1,304 @@
+import logging
+from bisect import bisect_left, bisect_right
+from collections import defaultdict
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Set, Tuple
+import numpy as np
+from app.config.settings import settings
+from .propertyRecord import PropertyRecord
+from .propertyColumns import PropertyColumns
+from .locationIndex import LocationIndex
+from .textIndex import TextIndex
+from .geoIndex import GeoIndex, parse_point
+from .textNormalize import fold
+from .exchangeRates import exchange_rates
+from .tokkoMetadata import metadata_store
+
+logger = logging.getLogger(__name__)
+
+# Params the index folds or lowercases itself, so their spelling does not change results
+_FOLDED_PARAMS = ('location', 'keywords', 'near')
+
+def normalize_search_params(search_params: Dict) -> Tuple:
+    """Hashable canonical form of search params, used as a result cache key"""
+    normalized = []
+    for name, value in search_params.items():
+        if value is None or value == '':
+            continue
+        if name == 'operation_type':
+            value = metadata_store.current.operation_name(value)
+        elif isinstance(value, str):
+            value = fold(value) if name in _FOLDED_PARAMS else value.strip()
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            value = float(value)
+        normalized.append((name, value))
+    return tuple(sorted(normalized))
+
+class SortedColumn:
+    """Values sorted ascending with the record position of each value"""
+
+    def __init__(self, pairs: Iterable[Tuple[float, int]]):
+        pairs = sorted(pairs)
+        self.values = [value for value, _ in pairs]
+        self.positions = [position for _, position in pairs]
+
+    @classmethod
+    def from_array(cls, column: np.ndarray) -> 'SortedColumn':
+        """Sorted view of a NumPy column, skipping NaN"""
+        positions = np.flatnonzero(np.isfinite(column))
+        order = np.argsort(column[positions], kind='stable')
+        sorted_column = cls(())
+        sorted_column.values = column[positions][order].tolist()
+        sorted_column.positions = positions[order].tolist()
+        return sorted_column
+
+    def span(self, low: Optional[float] = None, high: Optional[float] = None) -> Tuple[int, int]:
+        start = 0 if low is None else bisect_left(self.values, low)
+        end = len(self.values) if high is None else bisect_right(self.values, high)
+        return start, max(start, end)
+
+    def __len__(self) -> int:
+        return len(self.values)
+
+class Posting:
+    """Sorted record positions for one key, with a lazily built membership set"""
+
+    __slots__ = ('positions', '_members')
+
+    def __init__(self, positions: Optional[List[int]] = None):
+        self.positions = positions if positions is not None else []
+        self._members = None
+
+    @property
+    def members(self) -> frozenset:
+        if self._members is None:
+            self._members = frozenset(self.positions)
+        return self._members
+
+    def __len__(self) -> int:
+        return len(self.positions)
+
+EMPTY_POSTING = Posting()
+
+class Predicate:
+    """One query condition: a size estimate and a way to enumerate its
+    matches. Posting predicates also expose their members as a set so they
+    can be intersected directly; numeric bounds are re-checked by
+    PropertyColumns."""
+
+    def __init__(self, estimate: int, materialize: Callable[[], Iterable[int]],
+                 members: Optional[Callable[[], frozenset]] = None):
+        self.estimate = estimate
+        self.materialize = materialize
+        self.members = members
+
+class PropertyIndex:
+    """Posting-list and sorted-array indexes over one inventory snapshot.
+
+    Record positions in the snapshot act as document ids. Equality filters
+    use posting lists and numeric ranges use bisect over sorted columns to
+    pick the most selective candidate set; the numeric predicates are then
+    applied to the candidates in one vectorized pass, so cost follows the
+    result size instead of the inventory size.
+    """
+
+    def __init__(self, records: Sequence[PropertyRecord], previous: Optional['PropertyIndex'] = None):
+        self.records = records
+        self.by_operation: Dict[str, Posting] = defaultdict(Posting)
+        self.by_type_id: Dict[int, Posting] = defaultdict(Posting)
+        self.by_location_id: Dict[int, Posting] = defaultdict(Posting)
+        self.type_ids_by_name: Dict[str, Set[int]] = defaultdict(set)
+        location_names: Dict[int, str] = {}
+
+        rooms, surfaces = [], []
+
+        for position, record in enumerate(records):
+            for operation_type in set(record.operation_types):
+                self.by_operation[operation_type.lower()].positions.append(position)
+            self.by_type_id[record.type_id].positions.append(position)
+            self.type_ids_by_name[fold(record.type_name)].add(record.type_id)
+            self.by_location_id[record.location_id].positions.append(position)
+            location_names[record.location_id] = record.location_name
+            rooms.append((record.rooms, position))
+            if record.total_surface is not None:
+                surfaces.append((record.total_surface, position))
+
+        self.rooms = SortedColumn(rooms)
+        self.surface = SortedColumn(surfaces)
+        self.columns = PropertyColumns(records)
+        self.locations = LocationIndex(location_names.items())
+        self.text = TextIndex(records, previous.text if previous is not None else None)
+        self.geo = GeoIndex(records, settings.geo_cell_km, settings.geo_max_radius_km)
+        self._prices: Dict[Optional[str], Tuple[int, SortedColumn, List[int]]] = {}
+
+    def __len__(self) -> int:
+        return len(self.records)
+
+    # --- predicate builders -------------------------------------------------
+
+    def _posting(self, postings: List[Posting]) -> Predicate:
+        """Union of posting lists as a single predicate"""
+        if len(postings) == 1:
+            posting = postings[0]
+            return Predicate(len(posting), lambda: posting.positions, lambda: posting.members)
+        members = frozenset().union(*(posting.members for posting in postings))
+        return Predicate(len(members), lambda: members, lambda: members)
+
+    def _range(self, column: SortedColumn, low: Optional[float], high: Optional[float]) -> Predicate:
+        start, end = column.span(low, high)
+        return Predicate(end - start, lambda: column.positions[start:end])
+
+    def price_range(self, operation_type: Optional[str]) -> Tuple[SortedColumn, List[int]]:
+        """Sorted base-currency prices of one operation plus the unpriced positions,
+        rebuilt when the exchange rates change"""
+        key = operation_type.lower() if operation_type else None
+        cached = self._prices.get(key)
+        if cached is None or cached[0] != exchange_rates.version:
+            column = self.columns.normalized_prices(operation_type)
+            cached = (exchange_rates.version, SortedColumn.from_array(column),
+                      np.flatnonzero(~np.isfinite(column)).tolist())
+            self._prices[key] = cached
+        return cached[1], cached[2]
+
+    def resolve_type_ids(self, property_type: str) -> Set[int]:
+        """Tokko type ids for a type name, code or Spanish/English synonym (case- and accent-insensitive)"""
+        type_ids = set(self.type_ids_by_name.get(fold(property_type), ()))
+        mapped = metadata_store.current.property_type_id(property_type)
+        if mapped is not None:
+            type_ids.add(mapped)
+        return type_ids
+
+    def resolve_location_ids(self, location: str) -> Set[int]:
+        """Location ids for a free-text location (accent-insensitive, aliases, fuzzy fallback)"""
+        return self.locations.resolve(location)
+
+    def resolve_point(self, near: str) -> Optional[Tuple[float, float]]:
+        """Coordinates for a 'lat,long' pair, a configured landmark or a zone (centroid of its listings)"""
+        point = parse_point(near)
+        if point:
+            return point
+        landmarks = {fold(name): coordinates for name, coordinates in settings.geo_landmarks.items()}
+        if fold(near) in landmarks:
+            lat, lon = landmarks[fold(near)]
+            return float(lat), float(lon)
+        location_ids = self.locations.resolve(near)
+        positions = [position for location_id in location_ids for position in self.by_location_id[location_id].positions]
+        return self.geo.centroid(positions)
+
+    def near(self, search_params: Dict) -> Optional[Dict[int, float]]:
+        """Distance in km per position within radius_km of search_params['near']"""
+        near = (search_params.get('near') or '').strip()
+        if not near:
+            return None
+        point = self.resolve_point(near)
+        if point is None:
+            logger.info(f"Could not resolve reference point '{near}'")
+            return {}
+        radius_km = search_params.get('radius_km') or settings.geo_default_radius_km
+        return self.geo.radius(point[0], point[1], radius_km)
+
+    # --- querying -------------------------------------------------------------
+
+    def predicates(self, search_params: Dict, text_scores: Optional[Dict[int, float]] = None,
+                   distances: Optional[Dict[int, float]] = None) -> Optional[List[Predicate]]:
+        """Translate search params into predicates; None means nothing can match"""
+        predicates = []
+
+        # Text and geo matches come as {position: score} and act as postings
+        for scored in (text_scores, distances):
+            if scored is None:
+                continue
+            if not scored:
+                return None
+            members = frozenset(scored)
+            predicates.append(Predicate(len(members), lambda members=members: members,
+                                        lambda members=members: members))
+
+        operation_type = search_params.get('operation_type')
+        if operation_type:
+            predicates.append(self._posting([self.by_operation.get(operation_type.lower(), EMPTY_POSTING)]))
+
+        if search_params.get('property_type'):
+            type_ids = self.resolve_type_ids(search_params['property_type'])
+            if not type_ids:
+                return None
+            predicates.append(self._posting([self.by_type_id.get(type_id, EMPTY_POSTING) for type_id in type_ids]))
+
+        if search_params.get('location'):
+            location_ids = self.resolve_location_ids(search_params['location'])
+            if not location_ids:
+                return None
+            predicates.append(self._posting([self.by_location_id[location_id] for location_id in location_ids]))
+
+        if search_params.get('min_rooms') or search_params.get('max_rooms'):
+            predicates.append(self._range(self.rooms, search_params.get('min_rooms'), search_params.get('max_rooms')))
+
+        if search_params.get('min_surface') or search_params.get('max_surface'):
+            predicates.append(self._range(self.surface, search_params.get('min_surface'), search_params.get('max_surface')))
+
+        if search_params.get('min_price') or search_params.get('max_price'):
+            low, high = self.columns.budget(search_params)
+            if low is not None or high is not None:
+                prices, unpriced = self.price_range(search_params.get('operation_type'))
+                start, end = prices.span(low, high)
+                # Unpriced listings stay candidates; PropertyColumns keeps them too
+                predicates.append(Predicate(end - start + len(unpriced),
+                                            lambda: prices.positions[start:end] + unpriced))
+
+        return predicates
+
+    def query(self, search_params: Dict, ranked: bool = False) -> List[PropertyRecord]:
+        """Records matching every search param, in snapshot order, by relevance
+        or by search_params['sort']; keyword searches return the top text_search_top_k"""
+        if search_params.get('operation_type'):
+            # 'Alquiler', 'venta', ... -> the operation name used on listings
+            search_params = {**search_params,
+                             'operation_type': metadata_store.current.operation_name(search_params['operation_type'])}
+        keywords = (search_params.get('keywords') or '').strip()
+        text_scores = self.text.scores(keywords, settings.text_min_should_match) if keywords else None
+        distances = self.near(search_params)
+        predicates = self.predicates(search_params, text_scores, distances)
+        if predicates is None:
+            return []
+
+        predicates.sort(key=lambda predicate: predicate.estimate)
+        postings = [predicate for predicate in predicates if predicate.members is not None]
+
+        if not predicates:
+            candidates = range(len(self.records))
+        elif postings and postings[0].estimate <= predicates[0].estimate * 4:
+            # Intersect posting lists smallest-first
+            candidates = postings[0].members()
+            for predicate in postings[1:]:
+                if not candidates:
+                    break
+                candidates = candidates & predicate.members()
+        else:
+            # A range is far more selective: enumerate it and check the postings
+            members = [predicate.members() for predicate in postings]
+            candidates = [position for position in predicates[0].materialize()
+                          if all(position in member for member in members)]
+
+        positions = np.fromiter(candidates, dtype=np.int64)
+        positions.sort()
+        positions = self.columns.filter(positions, search_params)
+        if ranked and text_scores:
+            # Keyword searches keep only the most relevant matches
+            positions = self.rank_by_text(positions, search_params, text_scores)[:settings.text_search_top_k]
+            if search_params.get('sort'):
+                positions = self.columns.order(positions, search_params['sort'], search_params)
+        elif search_params.get('sort'):
+            positions = self.columns.order(positions, search_params['sort'], search_params)
+        elif ranked and distances:
+            positions = positions[np.argsort([distances[position] for position in positions.tolist()], kind='stable')]
+        elif ranked:
+            positions = self.columns.rank(positions, search_params)
+        return [self.records[position] for position in positions.tolist()]
+
+    def rank_by_text(self, positions: np.ndarray, search_params: Dict, text_scores: Dict[int, float]) -> np.ndarray:
+        """Order by BM25 relevance, with the numeric score as a tie-breaker"""
+        if len(positions) < 2:
+            return positions
+        relevance = np.array([text_scores[position] for position in positions.tolist()])
+        relevance /= relevance.max() or 1.0
+        combined = relevance + 0.25 * self.columns.score(positions, search_params)
+        return positions[np.argsort(-combined, kind='stable')]
@@ -0,0 +1,166 @@
+import sys
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+def _intern(value: Optional[str]) -> str:
+    return sys.intern(value or '')
+
+def _number(value: Any, cast=float) -> Optional[float]:
+    """Tokko mixes numbers and numeric strings ("44.00"); empty/invalid -> None"""
+    try:
+        return cast(float(value))
+    except (TypeError, ValueError):
+        return None
+
+def _clean_description(prop: Dict) -> str:
+    """Plain-text description without the agency footer Tokko appends to every listing"""
+    description = (prop.get('description') or '').strip()
+    footer = (prop.get('footer') or '').strip()
+    if footer and description.endswith(footer):
+        description = description[:-len(footer)].rstrip()
+    return description
+
+def change_marker(prop: Dict) -> str:
+    """Latest change timestamp of a raw listing (Tokko bumps deleted_at on every edit)"""
+    return max(
+        prop.get('created_at') or '',
+        prop.get('deleted_at') or '',
+        prop.get('updated_at') or '',
+        prop.get('modified_at') or ''
+    )
+
+def _photo_url(value: Any) -> str:
+    """Tokko sends photo URLs either as strings or as {"url": ...} objects"""
+    if isinstance(value, dict):
+        return value.get('url') or ''
+    return value or ''
+
+def normalize_photos(prop: Dict) -> Tuple[Tuple[str, str, str, Optional[int], Optional[int]], ...]:
+    """(image, thumb, original, width, height) per photo: front cover first, then
+    Tokko's order, blueprints last. Dimensions are kept when Tokko sends them."""
+    photos = []
+    for photo in prop.get('photos') or []:
+        image = _photo_url(photo.get('image'))
+        original = _photo_url(photo.get('original'))
+        if not (image or original):
+            continue
+        photos.append((
+            (not photo.get('is_front_cover'), bool(photo.get('is_blueprint')), photo.get('order') or 0),
+            (image or original, _photo_url(photo.get('thumb')) or image or original, original or image,
+             _number(photo.get('width'), int), _number(photo.get('height'), int))
+        ))
+    photos.sort(key=lambda item: item[0])
+    return tuple(photo for _, photo in photos)
+
+class PropertyRecord:
+    """Normalized listing holding only what search, ranking and cards need.
+
+    The raw Tokko object (HTML descriptions, every photo, producer, ...) is
+    not kept in memory; fetch it on demand through TokkoClient.get_raw_property
+    (served by GET /api/properties/{property_id}).
+    """
+
+    __slots__ = (
+        'id', 'title', 'type_id', 'type_name', 'location_id', 'location_name',
+        'address', 'operations', 'rooms', 'bathrooms', 'total_surface',
+        'roofed_surface', 'expenses', 'age', 'geo_lat', 'geo_long',
+        'description', 'image_url', 'thumb_url', 'photos', 'public_url', 'parking',
+        'tags', 'status', 'created_at', 'deleted_at', 'change_marker'
+    )
+
+    def __init__(self, **fields):
+        for name in self.__slots__:
+            setattr(self, name, fields.get(name))
+
+    @classmethod
+    def from_tokko(cls, prop: Dict) -> 'PropertyRecord':
+        """Build a record from a raw /property/ object"""
+        prop_type = prop.get('type') or {}
+        location = prop.get('location') or {}
+
+        # (operation_type, currency, price) for the first price of every operation
+        operations = []
+        for operation in prop.get('operations', []):
+            prices = operation.get('prices') or [{}]
+            operations.append((
+                _intern(operation.get('operation_type')),
+                _intern(prices[0].get('currency')),
+                _number(prices[0].get('price'))
+            ))
+
+        photos = normalize_photos(prop)
+
+        return cls(
+            id=prop.get('id'),
+            title=prop.get('publication_title') or '',
+            type_id=prop_type.get('id'),
+            type_name=_intern(prop_type.get('name')),
+            location_id=location.get('id'),
+            location_name=_intern(location.get('name')),
+            address=prop.get('fake_address') or prop.get('address') or '',
+            operations=tuple(operations),
+            rooms=_number(prop.get('room_amount'), int) or 0,
+            bathrooms=_number(prop.get('bathroom_amount'), int) or 0,
+            total_surface=_number(prop.get('total_surface')),
+            roofed_surface=_number(prop.get('roofed_surface')),
+            expenses=_number(prop.get('expenses'), int) or 0,
+            age=_number(prop.get('age'), int),
+            geo_lat=_number(prop.get('geo_lat')),
+            geo_long=_number(prop.get('geo_long')),
+            description=_clean_description(prop),
+            image_url=photos[0][0] if photos else '',
+            thumb_url=photos[0][1] if photos else '',
+            photos=photos,
+            public_url=prop.get('public_url') or '',
+            parking=_number(prop.get('parking_lot_amount'), int) or 0,
+            tags=tuple(_intern(tag.get('name')) for tag in prop.get('tags', [])),
+            status=prop.get('status'),
+            created_at=prop.get('created_at') or '',
+            deleted_at=prop.get('deleted_at') or '',
+            # Same marker the delta sync pages by, so the high-water mark matches Tokko's ordering
+            change_marker=change_marker(prop)
+        )
+
+    @property
+    def operation_types(self) -> Tuple[str, ...]:
+        return tuple(operation[0] for operation in self.operations)
+
+    def price_for(self, operation_type: Optional[str] = None) -> Optional[Tuple[str, float]]:
+        """(currency, price) of the given operation, or of the first priced one"""
+        for op_type, currency, price in self.operations:
+            if price is not None and (operation_type is None or op_type == operation_type):
+                return currency, price
+        return None
+
+    def to_row(self) -> List[Any]:
+        """Compact positional form used by the on-disk snapshot"""
+        return [getattr(self, name) for name in self.__slots__]
+
+    @classmethod
+    def from_row(cls, row: List[Any]) -> 'PropertyRecord':
+        record = cls(**dict(zip(cls.__slots__, row)))
+        record.type_name = _intern(record.type_name)
+        record.location_name = _intern(record.location_name)
+        record.operations = tuple((_intern(op), _intern(cur), price) for op, cur, price in record.operations)
+        record.tags = tuple(_intern(tag) for tag in record.tags)
+        record.photos = tuple(tuple(photo) for photo in record.photos)
+        return record
+
+    def to_dict(self, fields: Optional[Sequence[str]] = None) -> Dict[str, Any]:
+        """JSON-ready dict of all fields, or only of the given ones"""
+        data = {name: getattr(self, name) for name in (fields or self.__slots__)}
+        if 'operations' in data:
+            data['operations'] = [
+                {"operation_type": op, "currency": currency, "price": price}
+                for op, currency, price in self.operations
+            ]
+        if 'tags' in data:
+            data['tags'] = list(self.tags)
+        if 'photos' in data:
+            data['photos'] = [
+                {"image": image, "thumb": thumb, "original": original, "width": width, "height": height}
+                for image, thumb, original, width, height in self.photos
+            ]
+        return data
+
+    def __repr__(self) -> str:
+        return f"PropertyRecord(id={self.id}, title={self.title!r})"
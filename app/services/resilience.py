@@ -0,0 +1,188 @@
+import asyncio
+import logging
+import random
+import time
+from collections import deque
+from typing import Any, Awaitable, Callable, Dict, Optional, TypeVar
+from app.config.settings import settings
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar('T')
+
+class CircuitOpenError(Exception):
+    """Raised without calling upstream while the circuit breaker is open"""
+    pass
+
+class LatencyTracker:
+    """Rolling window of successful call latencies"""
+
+    def __init__(self, window: int = 200):
+        self.samples = deque(maxlen=window)
+
+    def record(self, seconds: float) -> None:
+        self.samples.append(seconds)
+
+    def percentile(self, q: float) -> Optional[float]:
+        if len(self.samples) < settings.tokko_hedge_min_samples:
+            return None
+        ordered = sorted(self.samples)
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+class RetryBudget:
+    """Token bucket that caps retries and hedges to a fraction of calls.
+
+    Every call deposits `ratio` tokens (up to `capacity`); every retry or
+    hedge spends one. When Tokko is down, retries stop at roughly ratio x
+    traffic instead of multiplying the load on it.
+    """
+
+    def __init__(self, ratio: float, capacity: float):
+        self.ratio = ratio
+        self.capacity = capacity
+        self.tokens = capacity
+
+    def deposit(self) -> None:
+        self.tokens = min(self.capacity, self.tokens + self.ratio)
+
+    def withdraw(self) -> bool:
+        if self.tokens < 1:
+            return False
+        self.tokens -= 1
+        return True
+
+class CircuitBreaker:
+    """Opens after `threshold` consecutive failures, fails fast for
+    `reset_seconds`, then lets one probe call through (half-open)."""
+
+    def __init__(self, threshold: int, reset_seconds: float):
+        self.threshold = threshold
+        self.reset_seconds = reset_seconds
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+        self._probing = False
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() - self.opened_at >= self.reset_seconds:
+            return "half_open"
+        return "open"
+
+    def allow(self) -> bool:
+        state = self.state
+        if state == "closed":
+            return True
+        if state == "half_open" and not self._probing:
+            self._probing = True
+            return True
+        return False
+
+    def record_success(self) -> None:
+        if self.opened_at is not None:
+            logger.info("Tokko circuit closed")
+        self.failures = 0
+        self.opened_at = None
+        self._probing = False
+
+    def record_failure(self) -> None:
+        self.failures += 1
+        if self._probing or (self.opened_at is None and self.failures >= self.threshold):
+            logger.warning(f"Tokko circuit open for {self.reset_seconds:.0f}s after {self.failures} failures")
+            self.opened_at = time.monotonic()
+        self._probing = False
+
+class ResiliencePolicy:
+    """Deadline, budgeted jittered retries, p95 hedging and a circuit breaker
+    around idempotent upstream calls.
+
+    `is_retryable(exc)` decides which failures count against the breaker and
+    may be retried; anything else (e.g. a 404) is raised as is.
+    """
+
+    def __init__(self, is_retryable: Callable[[BaseException], bool], name: str = "tokko"):
+        self.name = name
+        self.is_retryable = is_retryable
+        self.latency = LatencyTracker()
+        self.budget = RetryBudget(settings.tokko_retry_budget_ratio, settings.tokko_retry_budget_capacity)
+        self.breaker = CircuitBreaker(settings.tokko_breaker_failures, settings.tokko_breaker_reset_seconds)
+        self.hedges = 0
+        self.retries = 0
+
+    async def call(self, fn: Callable[[], Awaitable[T]], deadline: Optional[float] = None) -> T:
+        if not self.breaker.allow():
+            raise CircuitOpenError(f"{self.name} circuit open, failing fast")
+        self.budget.deposit()
+        deadline_at = time.monotonic() + (deadline or settings.tokko_deadline_seconds)
+        attempt = 0
+
+        while True:
+            attempt += 1
+            remaining = deadline_at - time.monotonic()
+            try:
+                if remaining <= 0:
+                    raise asyncio.TimeoutError()
+                result = await asyncio.wait_for(self._hedged(fn), remaining)
+            except Exception as e:
+                if not self.is_retryable(e):
+                    # Upstream answered (e.g. 404): it is up, whatever the answer
+                    self.breaker.record_success()
+                    raise
+                self.breaker.record_failure()
+                delay = random.uniform(0, settings.tokko_retry_base_delay * 2 ** (attempt - 1))
+                if (attempt >= settings.tokko_max_attempts or self.breaker.state == "open"
+                        or time.monotonic() + delay >= deadline_at or not self.budget.withdraw()):
+                    raise
+                self.retries += 1
+                logger.info(f"Retrying {self.name} call in {delay:.2f}s (attempt {attempt + 1}): {type(e).__name__}")
+                await asyncio.sleep(delay)
+                continue
+            self.breaker.record_success()
+            return result
+
+    async def _timed(self, fn: Callable[[], Awaitable[T]]) -> T:
+        started = time.monotonic()
+        result = await fn()
+        self.latency.record(time.monotonic() - started)
+        return result
+
+    async def _hedged(self, fn: Callable[[], Awaitable[T]]) -> T:
+        """Run fn; if it is still pending after the observed p95, race a second copy"""
+        primary = asyncio.ensure_future(self._timed(fn))
+        p95 = self.latency.percentile(0.95) if settings.tokko_hedge_enabled else None
+        if p95 is None:
+            return await primary
+
+        hedge = None
+        try:
+            done, _ = await asyncio.wait({primary}, timeout=p95)
+            if done or not self.budget.withdraw():
+                return await primary
+
+            self.hedges += 1
+            hedge = asyncio.ensure_future(self._timed(fn))
+            pending = {primary, hedge}
+            error: Optional[BaseException] = None
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        return task.result()
+                    error = task.exception()
+            raise error
+        finally:
+            for task in (primary, hedge):
+                if task is not None and not task.done():
+                    task.cancel()
+
+    def status(self) -> Dict[str, Any]:
+        p95 = self.latency.percentile(0.95)
+        return {
+            "circuit": self.breaker.state,
+            "consecutive_failures": self.breaker.failures,
+            "retry_tokens": round(self.budget.tokens, 2),
+            "p95_ms": round(p95 * 1000) if p95 is not None else None,
+            "retries": self.retries,
+            "hedges": self.hedges
+        }
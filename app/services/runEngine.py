@@ -0,0 +1,246 @@
+import asyncio
+import logging
+import random
+import time
+from collections import deque
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+from app.config import settings
+from openai import RateLimitError
+
+logger = logging.getLogger(__name__)
+
+# Executes a run's tool calls and returns [{"tool_call_id", "output"}, ...]
+ToolExecutor = Callable[[List[Any]], Awaitable[List[Dict[str, str]]]]
+
+TERMINAL_FAILURES = ("failed", "cancelled", "expired", "incomplete")
+
+class OpenAIError(Exception):
+    """Custom exception for OpenAI specific errors"""
+    pass
+
+def _message_text(message) -> str:
+    for part in message.content or []:
+        if getattr(part, 'type', None) == 'text':
+            return part.text.value
+    return ""
+
+def _run_error(run) -> OpenAIError:
+    error_msg = f"OpenAI run {run.status}"
+    if getattr(run, 'last_error', None):
+        error_msg += f": {run.last_error}"
+    logger.error(error_msg)
+    return OpenAIError(error_msg)
+
+def _retry_after(error: Exception) -> Optional[float]:
+    """Seconds the server asked us to wait (Retry-After / retry-after-ms), if any"""
+    headers = getattr(getattr(error, 'response', None), 'headers', None) or {}
+    try:
+        if headers.get('retry-after-ms'):
+            return float(headers['retry-after-ms']) / 1000
+        if headers.get('retry-after'):
+            return float(headers['retry-after'])
+    except (TypeError, ValueError):
+        pass
+    return None
+
+class RunTimings:
+    """Time a run spends in each status, plus how many polls it took"""
+
+    PHASES = ("queued", "in_progress", "requires_action")
+
+    def __init__(self):
+        self.started = time.monotonic()
+        self.phases: Dict[str, float] = {phase: 0.0 for phase in self.PHASES}
+        self.polls = 0
+        self.transport = "stream"
+        self._status: Optional[str] = "queued"
+        self._since = self.started
+        self.total: Optional[float] = None
+
+    def enter(self, status: str) -> None:
+        if status == self._status:
+            return
+        now = time.monotonic()
+        if self._status in self.phases:
+            self.phases[self._status] += now - self._since
+        self._status, self._since = status, now
+
+    def finish(self) -> None:
+        self.enter("done")
+        self.total = time.monotonic() - self.started
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            **{f"{phase}_ms": round(seconds * 1000) for phase, seconds in self.phases.items()},
+            "total_ms": round((self.total if self.total is not None else time.monotonic() - self.started) * 1000),
+            "polls": self.polls,
+            "transport": self.transport
+        }
+
+class RunEngine:
+    """Drives an Assistants run to completion.
+
+    The run is consumed as a server-sent event stream: tool calls are
+    executed as soon as `requires_action` arrives, their outputs are
+    submitted on a new stream, and the reply is returned when the run
+    completes, with no polling delay. If streaming is disabled or the stream
+    breaks, the run is created (or picked up) and polled on an exponential,
+    jittered schedule. Every run records how long it spent per status.
+    """
+
+    def __init__(self, client, execute_tools: ToolExecutor):
+        self.client = client
+        self.execute_tools = execute_tools
+        self.recent = deque(maxlen=100)
+
+    async def run(self, thread_id: str, assistant_id: str) -> Dict[str, Any]:
+        """Reply for the thread's last message: {"content", "thread_id", "status"[, "function_output"]}"""
+        result = {"content": "", "thread_id": thread_id, "status": "queued", "run_id": None, "tool_outputs": [],
+                  "timings": RunTimings()}
+        try:
+            if settings.openai_streaming_enabled:
+                try:
+                    await self._stream(result, assistant_id)
+                    return self._response(result)
+                except OpenAIError:
+                    raise
+                except Exception as e:
+                    logger.warning(f"Run stream failed, falling back to polling: {str(e)}")
+
+            result["timings"].transport = "poll"
+            await self._poll(result, assistant_id)
+            return self._response(result)
+        finally:
+            timings = result["timings"]
+            timings.finish()
+            self.recent.append(timings.to_dict())
+            logger.info(f"Run {result['run_id']} {result['status']}: {timings.to_dict()}")
+
+    async def _stream(self, result: Dict[str, Any], assistant_id: str) -> None:
+        thread_id = result["thread_id"]
+        stream = await self.client.beta.threads.runs.create(
+            thread_id=thread_id,
+            assistant_id=assistant_id,
+            stream=True
+        )
+        while stream is not None:
+            next_stream = None
+            async with stream:
+                async for event in stream:
+                    name, data = event.event, event.data
+                    # thread.run.step.* events carry run steps, not the run: keep the run's id and status
+                    if name.startswith("thread.run.") and not name.startswith("thread.run.step."):
+                        result["run_id"], result["status"] = data.id, data.status
+                        if getattr(data, 'object', 'thread.run') == "thread.run":
+                            # Phases are the run's statuses; a step's "completed" must not close in_progress
+                            result["timings"].enter(data.status)
+                    if name == "thread.run.created":
+                        logger.info(f"Run ID: {data.id}")
+                    elif name == "thread.message.completed":
+                        result["content"] = _message_text(data)
+                    elif name == "thread.run.requires_action":
+                        logger.info("Run requires action - executing tool calls")
+                        tool_outputs = await self.execute_tools(data.required_action.submit_tool_outputs.tool_calls)
+                        result["tool_outputs"].extend(tool_outputs)
+                        # The rest of the run continues on the stream the submission opens
+                        next_stream = await self.client.beta.threads.runs.submit_tool_outputs(
+                            run_id=data.id,
+                            thread_id=thread_id,
+                            tool_outputs=tool_outputs,
+                            stream=True
+                        )
+                        break
+                    elif name in ("thread.run.completed",) + tuple(f"thread.run.{status}" for status in TERMINAL_FAILURES):
+                        if data.status != "completed":
+                            raise _run_error(data)
+                        return
+                    elif name == "error":
+                        raise RuntimeError(f"Stream error: {data}")
+            stream = next_stream
+        raise RuntimeError("Run stream ended before the run completed")
+
+    async def _poll(self, result: Dict[str, Any], assistant_id: str) -> None:
+        """Poll the run (creating it unless the stream already did) until it completes"""
+        thread_id = result["thread_id"]
+        if result["run_id"] is None:
+            run = await self.client.beta.threads.runs.create(
+                thread_id=thread_id,
+                assistant_id=assistant_id
+            )
+            result["run_id"] = run.id
+            logger.info(f"Run ID: {run.id}")
+
+        timings = result["timings"]
+        deadline = time.monotonic() + settings.openai_run_timeout_seconds
+        interval = settings.openai_poll_initial_seconds
+        while time.monotonic() < deadline:
+            try:
+                timings.polls += 1
+                status = await self.client.beta.threads.runs.retrieve(
+                    thread_id=thread_id,
+                    run_id=result["run_id"]
+                )
+                result["status"] = status.status
+                timings.enter(status.status)
+
+                if status.status == "completed":
+                    messages = await self.client.beta.threads.messages.list(
+                        thread_id=thread_id,
+                        limit=10
+                    )
+                    result["content"] = _message_text(messages.data[0]) if messages.data else ""
+                    return
+
+                if status.status in TERMINAL_FAILURES:
+                    raise _run_error(status)
+
+                if status.status == "requires_action":
+                    logger.info("Run requires action - executing tool calls")
+                    tool_outputs = await self.execute_tools(status.required_action.submit_tool_outputs.tool_calls)
+                    result["tool_outputs"].extend(tool_outputs)
+                    await self.client.beta.threads.runs.submit_tool_outputs(
+                        thread_id=thread_id,
+                        run_id=status.id,
+                        tool_outputs=tool_outputs
+                    )
+                    # The run restarts after the submission: poll fast again
+                    interval = settings.openai_poll_initial_seconds
+                    continue
+
+                delay = interval
+                interval = min(interval * 2, settings.openai_poll_max_seconds)
+
+            except RateLimitError as e:
+                delay = _retry_after(e) or interval
+                interval = min(interval * 2, settings.openai_poll_max_seconds)
+                logger.warning(f"Rate limit hit, retrying in {delay:.2f}s")
+                await asyncio.sleep(min(delay, max(0.0, deadline - time.monotonic())))
+                continue
+
+            # Jitter keeps concurrent runs from polling in lockstep
+            await asyncio.sleep(random.uniform(delay / 2, delay))
+
+        raise OpenAIError("OpenAI request timed out")
+
+    def stats(self) -> Dict[str, Any]:
+        """Median per-phase timings and poll count over the recent runs"""
+        if not self.recent:
+            return {"runs": 0}
+        def median(key):
+            values = sorted(run[key] for run in self.recent)
+            return values[len(values) // 2]
+        keys = [f"{phase}_ms" for phase in RunTimings.PHASES] + ["total_ms", "polls"]
+        return {"runs": len(self.recent), **{f"median_{key}": median(key) for key in keys}}
+
+    @staticmethod
+    def _response(result: Dict[str, Any]) -> Dict[str, Any]:
+        response = {
+            "content": result["content"],
+            "thread_id": result["thread_id"],
+            "status": result["status"],
+            "timings": result["timings"].to_dict()
+        }
+        # The first tool output carries the search results the chat UI renders as cards
+        if result["tool_outputs"]:
+            response["function_output"] = result["tool_outputs"][0]["output"]
+        return response
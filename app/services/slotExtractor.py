@@ -0,0 +1,135 @@
+import logging
+import re
+from typing import Any, Dict, List, Optional, Tuple
+from .locationIndex import LocationIndex
+from .textNormalize import fold, strip_accents
+from .tokkoMetadata import TokkoMetadata
+
+logger = logging.getLogger(__name__)
+
+# Slots a search needs before it can run (same as the search_properties tool)
+REQUIRED_SLOTS = ('location', 'operation_type', 'property_type')
+
+# Words that carry no search criteria ("busco un depto en ...")
+FILLER = frozenset('''
+    hola buenas buen buenos dia dias tarde tardes noche noches che gracias porfa favor por
+    busco buscando buscar estoy estamos quiero queremos quisiera necesito necesitamos me nos
+    interesa interesaria gustaria ver hay tenes tienen tendrian algun alguna alguno algo
+    un una unos unas el la los las lo de del en a al para y o que zona barrio
+'''.split())
+
+NUMBER_WORDS = {'un': 1, 'uno': 1, 'una': 1, 'dos': 2, 'tres': 3, 'cuatro': 4, 'cinco': 5, 'seis': 6}
+_ROOMS = re.compile(r"\b(?:(?P<count>\d+|un|uno|una|dos|tres|cuatro|cinco|seis)\s*(?:ambientes?|amb)|(?P<mono>monoambientes?))\b")
+
+CURRENCY_WORDS = {'usd': 'USD', 'dolares': 'USD', 'dolar': 'USD', 'ars': 'ARS', 'pesos': 'ARS'}
+MULTIPLIERS = {'mil': 1_000, 'k': 1_000, 'millon': 1_000_000, 'millones': 1_000_000}
+_CURRENCY = r"(?:usd|dolares|dolar|ars|pesos)"
+_PRICE = re.compile(
+    r"\b(?:hasta|maximo|max|tope|menos de|no mas de|presupuesto(?: de)?)\s*"
+    rf"(?P<before>{_CURRENCY})?\s*(?P<amount>\d+(?:\.\d+)?)\s*(?P<mult>mil|k|millones|millon)?\b\s*"
+    rf"(?:de\s+)?(?P<after>{_CURRENCY})?\b"
+)
+
+def _price_text(message: str) -> str:
+    """Lower-cased, accent-free text with Argentine number and currency notation made regular:
+    'Hasta U$S 1.500.000' -> 'hasta  usd  1500000', '1,5 millones' -> '1.5 millones', '$' -> pesos"""
+    text = strip_accents(message)
+    text = re.sub(r"u\$[sd]|us\$", " usd ", text)
+    text = text.replace('$', ' ars ')
+    text = re.sub(r"(?<=\d)\.(?=\d{3}(?!\d))", "", text)
+    return re.sub(r"(?<=\d),(?=\d)", ".", text)
+
+def _singular(phrase: str) -> List[str]:
+    """The phrase plus singular forms of its last word ('casas' -> 'casa', 'locales' -> 'local')"""
+    forms = [phrase]
+    if phrase.endswith('es'):
+        forms.append(phrase[:-2])
+    if phrase.endswith('s'):
+        forms.append(phrase[:-1])
+    return forms
+
+class SlotExtraction:
+    """Search slots read from one message, with how much of the message they explain"""
+
+    __slots__ = ('slots', 'confidence', 'ambiguous', 'unexplained')
+
+    def __init__(self, slots: Dict[str, Any], confidence: float, ambiguous: List[str], unexplained: List[str]):
+        self.slots = slots
+        self.confidence = confidence
+        self.ambiguous = ambiguous
+        self.unexplained = unexplained
+
+    @property
+    def complete(self) -> bool:
+        return not self.ambiguous and all(self.slots.get(slot) for slot in REQUIRED_SLOTS)
+
+    def search_params(self) -> Dict[str, Any]:
+        return {key: value for key, value in self.slots.items() if value is not None}
+
+def extract_slots(message: str, metadata: TokkoMetadata, locations: LocationIndex) -> SlotExtraction:
+    """Operation, property type, location, rooms and budget from a Spanish search message.
+
+    Only exact vocabulary is accepted: metadata names and synonyms, location
+    names and aliases, "N ambientes" and "hasta <amount> <currency>" (a budget
+    without a currency is ambiguous). The confidence is the share of
+    meaningful words the slots account for, so a message asking for anything
+    else ("con balcón", "¿cuánto sale?") scores low.
+    """
+    slots: Dict[str, Any] = {}
+    found: Dict[str, set] = {'operation_type': set(), 'property_type': set(), 'location': set()}
+    explained = 0
+
+    text = _price_text(message)
+    price = _PRICE.search(text)
+    if price:
+        amount = float(price.group('amount')) * MULTIPLIERS.get(price.group('mult'), 1)
+        currency = price.group('before') or price.group('after')
+        slots['max_price'] = amount
+        slots['currency'] = CURRENCY_WORDS[currency] if currency else None
+        explained += 1
+        text = text[:price.start()] + ' ' + text[price.end():]
+
+    text = fold(text)
+    rooms = _ROOMS.search(text)
+    if rooms:
+        count = rooms.group('count')
+        slots['min_rooms'] = 1 if rooms.group('mono') else int(NUMBER_WORDS.get(count, count))
+        explained += 1
+        text = text[:rooms.start()] + ' ' + text[rooms.end():]
+
+    type_names = {prop_type.get('id'): prop_type.get('name') for prop_type in metadata.property_types}
+    words = text.split()
+    unexplained = []
+    i = 0
+    while i < len(words):
+        match: Optional[Tuple[str, Any, int]] = None
+        # Longest phrase first, so "villa ballester" wins over "villa"
+        for n in range(min(4, len(words) - i), 0, -1):
+            phrase = ' '.join(words[i:i + n])
+            if phrase in metadata.operations:
+                match = ('operation_type', metadata.operations[phrase][1], n)
+            elif any(form in metadata.type_ids for form in _singular(phrase)):
+                type_id = next(metadata.type_ids[form] for form in _singular(phrase) if form in metadata.type_ids)
+                match = ('property_type', type_names.get(type_id) or phrase, n)
+            elif phrase in locations.ids_by_key and phrase not in FILLER:
+                match = ('location', phrase, n)
+            if match:
+                break
+        if match:
+            slot, value, n = match
+            found[slot].add(value)
+            slots[slot] = value
+            explained += n
+            i += n
+            continue
+        if words[i] not in FILLER:
+            unexplained.append(words[i])
+        i += 1
+
+    ambiguous = [slot for slot, values in found.items() if len(values) > 1]
+    if 'max_price' in slots and slots['currency'] is None:
+        # "hasta 300 mil" could be pesos or dollars; the default currency would silently guess
+        ambiguous.append('currency')
+    meaningful = explained + len(unexplained)
+    confidence = explained / meaningful if meaningful else 0.0
+    return SlotExtraction(slots, confidence, ambiguous, unexplained)
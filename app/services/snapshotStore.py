@@ -0,0 +1,131 @@
+import json
+import logging
+import mmap
+import os
+import struct
+import uuid
+import zlib
+from datetime import datetime
+from typing import Any, Dict, Iterator, List, Optional
+from .propertyRecord import PropertyRecord
+
+logger = logging.getLogger(__name__)
+
+# File layout (little endian):
+#   header  magic | format version | flags | record count | meta length | index crc32
+#   meta    compact JSON (inventory version, high-water mark, sync timestamps)
+#   index   one (id, offset, length, crc32) entry per record
+#   data    zlib-compressed PropertyRecord row (compact JSON array) per record
+MAGIC = b"ALTINV"
+FORMAT_VERSION = 4
+HEADER = struct.Struct("<6sHHIII")
+INDEX_ENTRY = struct.Struct("<qQII")
+
+class SnapshotError(Exception):
+    """Raised when a snapshot file is missing, corrupt or from another format version"""
+    pass
+
+def write_snapshot(path: str, records: List[PropertyRecord], meta: Dict[str, Any]) -> int:
+    """Write the inventory to `path` atomically and return the file size"""
+    meta_blob = json.dumps(meta, separators=(",", ":")).encode("utf-8")
+    blobs = [zlib.compress(json.dumps(record.to_row(), separators=(",", ":"), ensure_ascii=False).encode("utf-8"))
+             for record in records]
+
+    data_start = HEADER.size + len(meta_blob) + INDEX_ENTRY.size * len(blobs)
+    index = bytearray()
+    offset = data_start
+    for record, blob in zip(records, blobs):
+        index += INDEX_ENTRY.pack(int(record.id or 0), offset, len(blob), zlib.crc32(blob))
+        offset += len(blob)
+
+    header = HEADER.pack(MAGIC, FORMAT_VERSION, 0, len(blobs), len(meta_blob), zlib.crc32(meta_blob + index))
+
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    # Unique per writer: instances may share the snapshot mount
+    tmp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(header)
+        f.write(meta_blob)
+        f.write(index)
+        for blob in blobs:
+            f.write(blob)
+    os.replace(tmp_path, path)
+    return offset
+
+class SnapshotReader:
+    """Memory-mapped snapshot; opening only validates the header and index,
+    records are decompressed (and checksummed) when they are read."""
+
+    def __init__(self, path: str):
+        self.path = path
+        try:
+            with open(path, "rb") as f:
+                self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except (OSError, ValueError) as e:
+            raise SnapshotError(f"Cannot open snapshot {path}: {e}")
+
+        if len(self._mmap) < HEADER.size:
+            raise SnapshotError(f"Snapshot {path} is truncated")
+        magic, version, _flags, count, meta_len, index_crc = HEADER.unpack_from(self._mmap, 0)
+        if magic != MAGIC:
+            raise SnapshotError(f"{path} is not an inventory snapshot")
+        if version != FORMAT_VERSION:
+            raise SnapshotError(f"Snapshot format v{version} is not supported (expected v{FORMAT_VERSION})")
+
+        index_start = HEADER.size + meta_len
+        index_end = index_start + INDEX_ENTRY.size * count
+        if len(self._mmap) < index_end or zlib.crc32(self._mmap[HEADER.size:index_end]) != index_crc:
+            raise SnapshotError(f"Snapshot {path} failed its index checksum")
+
+        self.meta = json.loads(self._mmap[HEADER.size:index_start])
+        self._index = [INDEX_ENTRY.unpack_from(self._mmap, pos) for pos in range(index_start, index_end, INDEX_ENTRY.size)]
+        self._positions = {entry[0]: pos for pos, entry in enumerate(self._index)}
+
+    def __len__(self) -> int:
+        return len(self._index)
+
+    @property
+    def version(self) -> int:
+        return self.meta.get("version", 0)
+
+    @property
+    def high_water_mark(self) -> Optional[str]:
+        return self.meta.get("high_water_mark")
+
+    def timestamp(self, key: str) -> Optional[datetime]:
+        value = self.meta.get(key)
+        return datetime.fromisoformat(value) if value else None
+
+    def _decode(self, position: int) -> PropertyRecord:
+        prop_id, offset, length, crc = self._index[position]
+        blob = self._mmap[offset:offset + length]
+        if zlib.crc32(blob) != crc:
+            raise SnapshotError(f"Snapshot record {prop_id} failed its checksum")
+        return PropertyRecord.from_row(json.loads(zlib.decompress(blob)))
+
+    def get(self, prop_id: int) -> Optional[PropertyRecord]:
+        """Decode a single record by listing id"""
+        position = self._positions.get(prop_id)
+        return None if position is None else self._decode(position)
+
+    def __iter__(self) -> Iterator[PropertyRecord]:
+        for position in range(len(self._index)):
+            yield self._decode(position)
+
+    def load_all(self) -> List[PropertyRecord]:
+        return list(self)
+
+    def close(self) -> None:
+        self._mmap.close()
+
+def open_snapshot(path: str) -> Optional[SnapshotReader]:
+    """Open a snapshot if one exists; a corrupt file is logged and ignored"""
+    if not path or not os.path.exists(path):
+        return None
+    try:
+        reader = SnapshotReader(path)
+        logger.info(f"Opened inventory snapshot {path} (v{reader.version}, {len(reader)} listings)")
+        return reader
+    except SnapshotError as e:
+        logger.warning(f"Ignoring inventory snapshot: {str(e)}")
+        return None
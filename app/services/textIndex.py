@@ -0,0 +1,92 @@
+import logging
+import math
+from collections import Counter, defaultdict
+from typing import Dict, List, Optional, Sequence, Tuple
+from .propertyRecord import PropertyRecord
+from .textNormalize import tokens
+
+logger = logging.getLogger(__name__)
+
+SPANISH_STOP_WORDS = frozenset("""
+a al algo algunas algunos ante antes como con contra cual cuando de del desde donde durante e el
+ella ellos en entre era es esa esas ese eso esos esta estan estas este esto estos fue ha hay hasta
+la las le les lo los mas me mi mis muy ni no nos o otra otras otro otros para pero poco por porque
+que quien se sea ser si sin sobre su sus tambien tiene tanto todo todos tu un una uno unos y ya
+""".split())
+
+def stem(word: str) -> str:
+    """Light Spanish stemmer: drop plural endings, then a final vowel
+    (balcones -> balcon, inmediata/inmediato -> inmediat)"""
+    if len(word) <= 3 or word.isdigit():
+        return word
+    if word.endswith('ces') and len(word) > 4:
+        word = word[:-3] + 'z'
+    elif word.endswith('es') and len(word) > 4 and word[-3] not in 'aeiou':
+        word = word[:-2]
+    elif word.endswith('s'):
+        word = word[:-1]
+    if len(word) > 3 and word[-1] in 'aeo':
+        word = word[:-1]
+    return word
+
+def analyze(text: str) -> List[str]:
+    """Folded, stop-word filtered, stemmed terms"""
+    return [stem(token) for token in tokens(text) if token not in SPANISH_STOP_WORDS]
+
+class TextIndex:
+    """BM25 inverted index over listing titles and descriptions.
+
+    Built with every snapshot; term counts of listings whose change marker
+    did not move are reused from the previous index, so a delta sync only
+    re-analyzes the listings that actually changed.
+    """
+
+    K1 = 1.2
+    B = 0.75
+
+    def __init__(self, records: Sequence[PropertyRecord], previous: Optional['TextIndex'] = None):
+        self.postings: Dict[str, List[Tuple[int, int]]] = defaultdict(list)
+        self.lengths: List[int] = []
+        self.analyzed: Dict[int, Tuple[str, Counter]] = {}
+
+        reused = 0
+        for position, record in enumerate(records):
+            cached = previous.analyzed.get(record.id) if previous is not None else None
+            if cached is not None and cached[0] == record.change_marker:
+                counts = cached[1]
+                reused += 1
+            else:
+                counts = Counter(analyze(f"{record.title} {record.description}"))
+            self.analyzed[record.id] = (record.change_marker, counts)
+            self.lengths.append(sum(counts.values()))
+            for term, frequency in counts.items():
+                self.postings[term].append((position, frequency))
+
+        self.size = len(self.lengths)
+        self.average_length = (sum(self.lengths) / self.size) if self.size else 0.0
+        if previous is not None:
+            logger.info(f"Text index built: {self.size} listings ({reused} reused), {len(self.postings)} terms")
+
+    def idf(self, term: str) -> float:
+        frequency = len(self.postings.get(term, ()))
+        return math.log(1 + (self.size - frequency + 0.5) / (frequency + 0.5))
+
+    def scores(self, query: str, min_should_match: float = 1.0) -> Dict[int, float]:
+        """BM25 score per position containing at least min_should_match of the query terms
+        (1.0: all of them, so "balcón al frente" does not match every "frente")"""
+        terms = set(analyze(query))
+        if not terms:
+            return {}
+        required = max(1, math.ceil(min_should_match * len(terms)))
+        scores: Dict[int, float] = defaultdict(float)
+        matched: Dict[int, int] = defaultdict(int)
+        for term in terms:
+            postings = self.postings.get(term)
+            if not postings:
+                continue
+            idf = self.idf(term)
+            for position, frequency in postings:
+                norm = self.K1 * (1 - self.B + self.B * self.lengths[position] / (self.average_length or 1))
+                scores[position] += idf * frequency * (self.K1 + 1) / (frequency + norm)
+                matched[position] += 1
+        return {position: score for position, score in scores.items() if matched[position] >= required}
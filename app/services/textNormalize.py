@@ -0,0 +1,25 @@
+import re
+import unicodedata
+from typing import List, Set
+
+_NON_ALNUM = re.compile(r"[^a-z0-9]+")
+
+def strip_accents(text: str) -> str:
+    """Lower-case and strip accents, keeping punctuation: 'U$S 1.500' -> 'u$s 1.500'"""
+    decomposed = unicodedata.normalize('NFKD', text.lower())
+    return ''.join(char for char in decomposed if not unicodedata.combining(char))
+
+def fold(text: str) -> str:
+    """Lower-case, strip accents and collapse punctuation/whitespace:
+    'S.Martin(Ctro)' -> 's martin ctro', 'José León Suárez' -> 'jose leon suarez'"""
+    if not text:
+        return ''
+    return _NON_ALNUM.sub(' ', strip_accents(text)).strip()
+
+def tokens(text: str) -> List[str]:
+    return fold(text).split()
+
+def trigrams(text: str) -> Set[str]:
+    """Character trigrams of the folded text, padded so short words still match"""
+    folded = f"  {fold(text)} "
+    return {folded[i:i + 3] for i in range(len(folded) - 2)}
@@ -1,61 +1,123 @@
 import aiohttp
+import asyncio
 import json
 import logging
 from typing import Any, Dict, List, Optional
 from app.config.settings import settings
 from .cache import PropertyCache
+from .inventorySync import InventorySync
+from .propertyRecord import normalize_photos
+from .tokkoMetadata import metadata_store
+from .singleFlight import SingleFlight
+from .resilience import ResiliencePolicy
 
 logger = logging.getLogger(__name__)
 
-class TokkoClient:
-    # Complete property type mapping from API analysis
-    PROPERTY_TYPE_MAP = {
-        "Apartment": "2",   # AP
-        "House": "3",       # HO
-        "Land": "1",        # LA
-        "Garage": "10",     # GA
-        "Industrial Ship": "12",  # IS
-        "Bussiness Premises": "7",  # LO
-        "Condo": "13",      # PH
-        # Add Spanish variations
-        "Departamento": "2",
-        "Casa": "3",
-        "Terreno": "1",
-        "Cochera": "10",
-        "Nave Industrial": "12",
-        "Local": "7",
-        "PH": "13"
-    }
-
-    # Complete operation type mapping from API analysis
-    OPERATION_TYPE_MAP = {
-        "Rent": "1",
-        "Sale": "2",
-        # Spanish variations
-        "Alquiler": "1",
-        "Venta": "2",
-        # Additional variations
-        "rent": "1",
-        "sale": "2",
-        "alquiler": "1",
-        "venta": "2"
-    }
+class TokkoError(Exception):
+    """Custom exception for Tokko API errors"""
+
+    def __init__(self, message: str, status: Optional[int] = None):
+        super().__init__(message)
+        self.status = status
+
+def is_retryable(error: BaseException) -> bool:
+    """Network failures, timeouts, 429 and 5xx are worth retrying; other answers are final"""
+    if isinstance(error, TokkoError):
+        return error.status is None or error.status == 429 or error.status >= 500
+    return isinstance(error, (aiohttp.ClientError, asyncio.TimeoutError))
 
+class TokkoClient:
     def __init__(self):
         self.api_key = settings.tokko_api_key
         # Set default base URL if not configured
         self.base_url = getattr(settings, 'tokko_base_url', 'https://www.tokkobroker.com/api/v1')
         self._cache = {}
+        self._session: Optional[aiohttp.ClientSession] = None
+        # Identical concurrent requests share one upstream call
+        self.flights = SingleFlight("tokko")
+        # Deadlines, budgeted retries, hedging and a circuit breaker around every call
+        self.resilience = ResiliencePolicy(is_retryable)
         logger.info(f"Tokko client initialized with base_url: {self.base_url}")
 
+    async def start(self) -> None:
+        """Open the shared keep-alive session used by every Tokko request"""
+        if self._session is not None and not self._session.closed:
+            return
+        connector = aiohttp.TCPConnector(
+            limit=settings.tokko_pool_limit,
+            limit_per_host=settings.tokko_pool_limit_per_host,
+            keepalive_timeout=settings.tokko_keepalive_seconds,
+            ttl_dns_cache=settings.tokko_dns_cache_seconds,
+            use_dns_cache=True
+        )
+        timeout = aiohttp.ClientTimeout(
+            total=settings.tokko_total_timeout,
+            connect=settings.tokko_connect_timeout,
+            sock_read=settings.tokko_read_timeout
+        )
+        self._session = aiohttp.ClientSession(connector=connector, timeout=timeout)
+        logger.info(f"Tokko session opened (pool={settings.tokko_pool_limit}, "
+                    f"per_host={settings.tokko_pool_limit_per_host})")
+
+    async def close(self) -> None:
+        """Close the shared session and its pooled connections"""
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+            logger.info("Tokko session closed")
+        self._session = None
+
+    async def get_session(self) -> aiohttp.ClientSession:
+        """Return the shared session, opening it lazily outside of the app lifespan"""
+        if self._session is None or self._session.closed:
+            await self.start()
+        return self._session
+
+    @staticmethod
+    def _flight_key(endpoint: str, query: Dict[str, Any]) -> tuple:
+        return (endpoint,) + tuple(sorted((k, str(v)) for k, v in query.items() if k != "key"))
+
+    async def fetch_page(self, offset: int = 0, limit: int = 50, params: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """Fetch one page of /property/ and return the raw payload (meta + objects)"""
+        query = {
+            "key": self.api_key.get_secret_value(),
+            "format": "json",
+            "lang": "es",
+            **(params or {}),
+            "offset": str(offset),
+            "limit": str(limit)
+        }
+        url = f"{self.base_url}/property/"
+
+        async def request() -> Dict[str, Any]:
+            session = await self.get_session()
+            async with session.get(url, params=query) as response:
+                if response.status != 200:
+                    error_text = await response.text()
+                    raise TokkoError(f"Tokko API error {response.status} at offset {offset}: {error_text[:200]}",
+                                     response.status)
+                return await response.json()
+
+        return await self.flights.do(self._flight_key("/property/", query), lambda: self.resilience.call(request))
+
+    async def fetch_json(self, path: str, params: Optional[Dict[str, Any]] = None) -> Any:
+        """GET any Tokko endpoint (e.g. metadata lists) and return the decoded payload"""
+        query = {"key": self.api_key.get_secret_value(), "format": "json", "lang": "es", **(params or {})}
+        url = f"{self.base_url}{path}"
+
+        async def request() -> Any:
+            session = await self.get_session()
+            async with session.get(url, params=query) as response:
+                if response.status != 200:
+                    error_text = await response.text()
+                    raise TokkoError(f"Tokko API error {response.status} at {path}: {error_text[:200]}", response.status)
+                return await response.json()
+
+        return await self.flights.do(self._flight_key(path, query), lambda: self.resilience.call(request))
+
     async def search_properties(self, location: str, operation_type: str = None, property_type: str = None, rooms: Optional[int] = None, max_price: Optional[float] = None) -> List[Dict]:
         try:
             # Base parameters
-            params = {
-                "key": self.api_key.get_secret_value(),
-                "limit": "0",
-                "format": "json"
-            }
+            params = {}
 
             # Build filters dictionary
             filters = {}  # Remove "status": ["ACTIVE"] as it might be interfering
@@ -66,7 +128,7 @@ class TokkoClient:
 
             # Handle operation type
             if operation_type:
-                op_id = self.OPERATION_TYPE_MAP.get(operation_type.lower())
+                op_id = metadata_store.current.operation_id(operation_type)
                 if op_id:
                     # Changed to use operation_id instead of operation_types
                     filters["operation_id"] = op_id
@@ -74,7 +136,7 @@ class TokkoClient:
 
             # Handle property type
             if property_type:
-                type_id = self.PROPERTY_TYPE_MAP.get(property_type)
+                type_id = metadata_store.current.property_type_id(property_type)
                 if type_id:
                     # Changed to use type_id instead of property_types
                     filters["type_id"] = type_id
@@ -93,25 +155,11 @@ class TokkoClient:
             logger.info(f"Final search params: {params}")
             logger.info(f"Final filters: {filters}")
 
-            async with aiohttp.ClientSession() as session:
-                url = f"{self.base_url}/property/"  # Changed back to base property endpoint
-                logger.info(f"Making request to: {url}")
+            # Page through the results instead of a single limit=0 request
+            properties = await InventorySync(self).fetch_all(params)
+            logger.info(f"Found {len(properties)} properties")
 
-                async with session.get(url, params=params) as response:
-                    logger.info(f"Full request URL: {response.url}")
-                    
-                    if response.status != 200:
-                        error_text = await response.text()
-                        logger.error(f"Tokko API error: {error_text}")
-                        return []
-
-                    data = await response.json()
-                    logger.debug(f"Raw API response: {json.dumps(data)[:500]}...")
-
-                    properties = data.get('objects', [])
-                    logger.info(f"Found {len(properties)} properties")
-
-                    return properties
+            return properties
 
         except Exception as e:
             logger.error(f"Error searching properties: {str(e)}", exc_info=True)
@@ -119,18 +167,20 @@ class TokkoClient:
 
     async def get_property_detail(self, property_id: str) -> Optional[Dict[str, Any]]:
         """Get detailed information for a specific property"""
+        url = f"{self.base_url}/property/{property_id}/"
+        query = {"key": self.api_key.get_secret_value(), "format": "json", "lang": "es"}
+
+        async def request() -> Optional[Dict[str, Any]]:
+            session = await self.get_session()
+            async with session.get(url, params=query) as response:
+                if response.status == 200:
+                    return await response.json()
+                error_text = await response.text()
+                raise TokkoError(f"Error getting property details: {error_text[:200]}", response.status)
+
         try:
-            async with aiohttp.ClientSession() as session:
-                async with session.get(
-                    f"{self.base_url}/property/{property_id}/",
-                    headers=self.headers
-                ) as response:
-                    if response.status == 200:
-                        return await response.json()
-                    else:
-                        error_text = await response.text()
-                        logger.error(f"Error getting property details: {error_text}")
-                        return None
+            return await self.flights.do(self._flight_key(f"/property/{property_id}/", query),
+                                         lambda: self.resilience.call(request))
         except Exception as e:
             logger.error(f"Failed to get property details: {str(e)}")
             return None
@@ -172,8 +222,7 @@ class TokkoClient:
             'expenses_formatted': f"ARS {prop.get('expenses', 0):,}",
             'description': prop.get('description', ''),
             'features': features,
-            'image_url': next((p['image'].get('url', '') if isinstance(p.get('image'), dict) else p.get('image', '')
-                            for p in prop.get('photos', []) if p.get('image')), ''),
+            'image_url': next(iter(normalize_photos(prop)), ('',))[0],
             'url': prop.get('public_url', '#')
         }
 
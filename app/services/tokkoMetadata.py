@@ -0,0 +1,194 @@
+import asyncio
+import json
+import logging
+import os
+import time
+import uuid
+from typing import Any, Dict, List, Optional
+from app.config.settings import settings
+from .textNormalize import fold
+
+logger = logging.getLogger(__name__)
+
+# Known Tokko types (from the API analysis); used until the metadata endpoints answer
+SEED_PROPERTY_TYPES = [
+    {"id": 1, "code": "LA", "name": "Land"},
+    {"id": 2, "code": "AP", "name": "Apartment"},
+    {"id": 3, "code": "HO", "name": "House"},
+    {"id": 5, "code": "OF", "name": "Office"},
+    {"id": 7, "code": "LO", "name": "Bussiness Premises"},
+    {"id": 10, "code": "GA", "name": "Garage"},
+    {"id": 12, "code": "IS", "name": "Industrial Ship"},
+    {"id": 13, "code": "PH", "name": "Condo"},
+]
+SEED_OPERATION_TYPES = [
+    {"id": 1, "name": "Sale"},
+    {"id": 2, "name": "Rent"},
+    {"id": 3, "name": "Temporary rent"},
+]
+
+# Spanish and English synonyms per Tokko type code / operation name
+TYPE_SYNONYMS: Dict[str, List[str]] = {
+    "AP": ["apartment", "departamento", "depto", "dpto", "flat"],
+    "HO": ["house", "casa", "chalet"],
+    "LA": ["land", "terreno", "lote"],
+    "OF": ["office", "oficina"],
+    "LO": ["business premises", "bussiness premises", "local", "local comercial", "comercio"],
+    "GA": ["garage", "cochera"],
+    "IS": ["industrial ship", "nave industrial", "galpon", "deposito"],
+    "PH": ["condo", "ph"],
+}
+OPERATION_SYNONYMS: Dict[str, List[str]] = {
+    "sale": ["venta", "vender", "compra", "comprar", "compro"],
+    "rent": ["alquiler", "alquilar", "alquilo", "renta"],
+    "temporary rent": ["alquiler temporario", "temporario", "temporal"],
+}
+
+class TokkoMetadata:
+    """Tokko property types, operation types and tags with a compiled lookup.
+
+    Every name, code and synonym is accent-folded once when the table is
+    built, so resolving a user's "Depto" or "alquiler" is one dict lookup.
+    """
+
+    def __init__(self, property_types: List[Dict], operation_types: List[Dict], tags: Optional[List[Dict]] = None):
+        self.property_types = property_types
+        self.operation_types = operation_types
+        self.tags = tags or []
+
+        self.type_ids: Dict[str, int] = {}
+        for prop_type in property_types:
+            type_id = prop_type.get('id')
+            if type_id is None:
+                continue
+            names = [prop_type.get('name'), prop_type.get('code')] + TYPE_SYNONYMS.get(prop_type.get('code'), [])
+            for name in names:
+                if name:
+                    self.type_ids.setdefault(fold(name), int(type_id))
+
+        # Folded name or synonym -> (operation id, canonical lower-case English name)
+        self.operations: Dict[str, tuple] = {}
+        for operation in operation_types:
+            name = operation.get('name') or ''
+            canonical = name.lower()
+            for alias in [name] + OPERATION_SYNONYMS.get(canonical, []):
+                self.operations.setdefault(fold(alias), (operation.get('id'), canonical))
+
+        self.tag_ids: Dict[str, int] = {fold(tag['name']): tag['id'] for tag in self.tags if tag.get('name')}
+
+    @classmethod
+    def seed(cls) -> 'TokkoMetadata':
+        return cls(SEED_PROPERTY_TYPES, SEED_OPERATION_TYPES)
+
+    def property_type_id(self, name: Optional[str]) -> Optional[int]:
+        return self.type_ids.get(fold(name)) if name else None
+
+    def operation_id(self, name: Optional[str]) -> Optional[int]:
+        operation = self.operations.get(fold(name)) if name else None
+        return operation[0] if operation else None
+
+    def operation_name(self, name: Optional[str]) -> Optional[str]:
+        """Canonical operation name as used on listings, lower-cased ('alquiler' -> 'rent')"""
+        if not name:
+            return None
+        operation = self.operations.get(fold(name))
+        return operation[1] if operation else name.lower()
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {"property_types": self.property_types, "operation_types": self.operation_types, "tags": self.tags}
+
+def _as_list(payload: Any) -> Optional[List]:
+    """Tokko list endpoints answer either a bare list or {"objects": [...]}"""
+    if isinstance(payload, dict):
+        payload = payload.get('objects')
+    return payload if isinstance(payload, list) else None
+
+def _named(items: List, fallback: List[Dict]) -> List[Dict]:
+    """Endpoint items as dicts with at least a name; plain strings become {"name": ...}"""
+    named = [item if isinstance(item, dict) else {"name": str(item)} for item in items]
+    # Keep seed ids for entries the endpoint returns without one
+    seed_ids = {fold(item['name']): item for item in fallback}
+    return [{**seed_ids.get(fold(item.get('name') or ''), {}), **item} for item in named]
+
+class TokkoMetadataStore:
+    """Holds the current TokkoMetadata, refreshed concurrently from Tokko
+    every tokko_metadata_ttl_hours and persisted as JSON, so restarts and
+    Tokko outages keep the last known table."""
+
+    ENDPOINTS = {
+        "property_types": "/property/property_types/",
+        "operation_types": "/property/operation_types/",
+        "tags": "/property/tags/",
+    }
+
+    def __init__(self):
+        self.current = TokkoMetadata.seed()
+        self.loaded_at: Optional[float] = None
+        self.source = "seed"
+
+    def is_due(self) -> bool:
+        return self.loaded_at is None or time.monotonic() - self.loaded_at >= settings.tokko_metadata_ttl_hours * 3600
+
+    def restore(self, path: Optional[str] = None) -> bool:
+        path = path or settings.tokko_metadata_path
+        if not path or not os.path.exists(path):
+            return False
+        try:
+            with open(path, encoding='utf-8') as f:
+                data = json.load(f)
+            self.current = TokkoMetadata(data["property_types"], data["operation_types"], data.get("tags"))
+            self.source = "disk"
+            logger.info(f"Restored Tokko metadata from {path}")
+            return True
+        except (OSError, ValueError, KeyError) as e:
+            logger.warning(f"Ignoring Tokko metadata file {path}: {str(e)}")
+            return False
+
+    def persist(self, path: Optional[str] = None) -> None:
+        path = path or settings.tokko_metadata_path
+        if not path:
+            return
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        tmp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(self.current.to_dict(), f, ensure_ascii=False)
+        os.replace(tmp_path, path)
+
+    async def refresh(self, transport) -> TokkoMetadata:
+        """Fetch every metadata endpoint concurrently; endpoints that fail keep their previous values"""
+        names = list(self.ENDPOINTS)
+        results = await asyncio.gather(*(transport.fetch_json(self.ENDPOINTS[name]) for name in names),
+                                       return_exceptions=True)
+        fetched = {}
+        for name, result in zip(names, results):
+            items = None if isinstance(result, BaseException) else _as_list(result)
+            if items is None:
+                logger.warning(f"Tokko metadata {name} unavailable: {result if isinstance(result, BaseException) else 'unexpected payload'}")
+                continue
+            fetched[name] = items
+
+        previous = self.current
+        self.current = TokkoMetadata(
+            _named(fetched["property_types"], SEED_PROPERTY_TYPES) if "property_types" in fetched else previous.property_types,
+            _named(fetched["operation_types"], SEED_OPERATION_TYPES) if "operation_types" in fetched else previous.operation_types,
+            fetched.get("tags", previous.tags)
+        )
+        self.loaded_at = time.monotonic()
+        if fetched:
+            self.source = "tokko"
+            await asyncio.to_thread(self.persist)
+        logger.info(f"Tokko metadata refreshed ({', '.join(fetched) or 'no endpoints answered'}): "
+                    f"{len(self.current.type_ids)} type keys, {len(self.current.operations)} operation keys")
+        return self.current
+
+    async def refresh_if_due(self, transport) -> None:
+        if not self.is_due():
+            return
+        try:
+            await self.refresh(transport)
+        except Exception as e:
+            self.loaded_at = time.monotonic()
+            logger.warning(f"Tokko metadata refresh failed, keeping the {self.source} table: {str(e)}")
+
+# Process-wide metadata used by every search path
+metadata_store = TokkoMetadataStore()
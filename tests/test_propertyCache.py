@@ -0,0 +1,70 @@
+import asyncio
+import os
+import threading
+
+os.environ.setdefault("OPENAI_API_KEY", "test")
+os.environ.setdefault("TOKKO_API_KEY", "test")
+
+from app.services import aiAssistant
+from app.services.aiAssistant import PropertyCache
+
+def _listing(prop_id):
+    return {
+        "id": prop_id,
+        "publication_title": f"Depto {prop_id}",
+        "type": {"id": 2, "name": "Apartment"},
+        "location": {"id": 1, "name": "Palermo"},
+        "operations": [{"operation_type": "Sale", "prices": [{"currency": "USD", "price": 100000}]}],
+        "status": 2,
+        "created_at": f"2024-01-0{prop_id}T00:00:00"
+    }
+
+def test_corrupt_persisted_record_goes_cold(tmp_path):
+    path = str(tmp_path / "inventory.snap")
+    cache = PropertyCache()
+    asyncio.run(cache.update_cache([_listing(1), _listing(2)]))
+    cache.persist(path)
+
+    # Flip the last byte: the header and index still validate, the last record does not
+    with open(path, 'r+b') as f:
+        f.seek(-1, os.SEEK_END)
+        last = f.read(1)
+        f.seek(-1, os.SEEK_END)
+        f.write(bytes([last[0] ^ 0xFF]))
+
+    restored = PropertyCache()
+    assert restored.restore(path)
+    assert restored.is_loaded()
+
+    assert restored.properties == []
+    assert not restored.is_loaded()
+    assert restored.needs_full_sync()
+
+    asyncio.run(restored.update_cache([_listing(3)]))
+    assert [record.id for record in restored.properties] == [3]
+
+def test_snapshot_is_built_off_the_event_loop(monkeypatch):
+    builders = []
+
+    class RecordingSnapshot(aiAssistant.InventorySnapshot):
+        def __init__(self, *args, **kwargs):
+            builders.append(threading.get_ident())
+            super().__init__(*args, **kwargs)
+
+    async def sync():
+        cache = PropertyCache()
+        monkeypatch.setattr(aiAssistant, "InventorySnapshot", RecordingSnapshot)
+        await cache.update_cache([_listing(1), _listing(2)])
+        await cache.apply_delta([{**_listing(2), "status": 0}, _listing(3)])
+        return cache, threading.get_ident()
+
+    cache, loop_thread = asyncio.run(sync())
+    assert len(builders) == 2 and loop_thread not in builders
+    assert sorted(record.id for record in cache.properties) == [1, 3]
+    assert cache.version == 2
+
+def test_high_water_mark_follows_the_delta_sync_marker():
+    edited = {**_listing(1), "deleted_at": "2024-02-01T00:00:00", "updated_at": "2024-03-01T00:00:00"}
+    cache = PropertyCache()
+    asyncio.run(cache.update_cache([edited, _listing(2)]))
+    assert cache.high_water_mark == "2024-03-01T00:00:00"
@@ -0,0 +1,114 @@
+import asyncio
+import os
+from types import SimpleNamespace
+
+os.environ.setdefault("OPENAI_API_KEY", "test")
+os.environ.setdefault("TOKKO_API_KEY", "test")
+
+from app.config import settings
+from app.services.runEngine import RunEngine
+
+def _run(status):
+    tool_call = SimpleNamespace(id="call_1", function=SimpleNamespace(name="search_properties", arguments="{}"))
+    return SimpleNamespace(id="run_1", object="thread.run", status=status, last_error=None,
+                           required_action=SimpleNamespace(submit_tool_outputs=SimpleNamespace(tool_calls=[tool_call])))
+
+def _step(status):
+    return SimpleNamespace(id="step_1", object="thread.run.step", status=status)
+
+MESSAGE = SimpleNamespace(content=[SimpleNamespace(type="text", text=SimpleNamespace(value="Listo"))])
+
+class FakeStream:
+    def __init__(self, events):
+        self.events = events
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+    def __aiter__(self):
+        return self._iterate()
+
+    async def _iterate(self):
+        for name, data in self.events:
+            yield SimpleNamespace(event=name, data=data)
+
+class FakeRuns:
+    def __init__(self):
+        self.submitted_to = None
+        self.retrieved = []
+
+    async def create(self, thread_id, assistant_id, stream=False):
+        return FakeStream([
+            ("thread.run.created", _run("queued")),
+            ("thread.run.in_progress", _run("in_progress")),
+            ("thread.run.step.created", _step("in_progress")),
+            # Step deltas have no status at all
+            ("thread.run.step.delta", SimpleNamespace(id="step_1", object="thread.run.step.delta")),
+            ("thread.run.requires_action", _run("requires_action")),
+        ])
+
+    async def submit_tool_outputs(self, run_id, thread_id, tool_outputs, stream=False):
+        self.submitted_to = run_id
+        return FakeStream([
+            ("thread.run.step.completed", _step("completed")),
+            ("thread.run.in_progress", _run("in_progress")),
+            ("thread.message.completed", MESSAGE),
+            ("thread.run.completed", _run("completed")),
+        ])
+
+    async def retrieve(self, thread_id, run_id):
+        self.retrieved.append(run_id)
+        raise AssertionError("streamed run should not be polled")
+
+async def _execute_tools(tool_calls):
+    return [{"tool_call_id": call.id, "output": '{"type": "properties"}'} for call in tool_calls]
+
+def test_stream_ignores_run_step_events():
+    settings.openai_streaming_enabled = True
+    runs = FakeRuns()
+    client = SimpleNamespace(beta=SimpleNamespace(threads=SimpleNamespace(runs=runs)))
+    engine = RunEngine(client, _execute_tools)
+
+    response = asyncio.run(engine.run("thread_1", "asst_1"))
+
+    assert response["status"] == "completed"
+    assert response["content"] == "Listo"
+    assert response["function_output"] == '{"type": "properties"}'
+    assert runs.submitted_to == "run_1"
+    assert runs.retrieved == []
+    assert response["timings"]["transport"] == "stream"
+
+class PausingStream(FakeStream):
+    """FakeStream where None stands for a 50 ms gap between events"""
+
+    async def _iterate(self):
+        for event in self.events:
+            if event is None:
+                await asyncio.sleep(0.05)
+                continue
+            yield SimpleNamespace(event=event[0], data=event[1])
+
+class SlowStepRuns(FakeRuns):
+    """A run that stays in_progress while one of its steps completes"""
+
+    async def create(self, thread_id, assistant_id, stream=False):
+        return PausingStream([
+            ("thread.run.in_progress", _run("in_progress")),
+            None,
+            ("thread.run.step.completed", _step("completed")),
+            None,
+            ("thread.message.completed", MESSAGE),
+            ("thread.run.completed", _run("completed")),
+        ])
+
+def test_step_completion_does_not_end_run_phase():
+    settings.openai_streaming_enabled = True
+    client = SimpleNamespace(beta=SimpleNamespace(threads=SimpleNamespace(runs=SlowStepRuns())))
+
+    response = asyncio.run(RunEngine(client, _execute_tools).run("thread_1", "asst_1"))
+
+    # Both gaps fall inside in_progress, including the one after the step completed
+    assert response["timings"]["in_progress_ms"] >= 90